@@ -1,11 +1,25 @@
+from . import profiling, report, thirdparty
 from .checks import ( # noqa
     auth,
     decoders,
     encoders,
     forms,
     injection,
+    logcalls,
+    middleware,
+    redos,
     models,
+    queries,
+    rules,
     session,
+    staticfiles,
     templates,
+    uploads,
+    urls,
     views,
 )
+
+
+thirdparty.install()
+report.install()
+profiling.install()
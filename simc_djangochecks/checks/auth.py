@@ -1,6 +1,5 @@
 import re
 import ast
-from pathlib import Path
 
 from django.core.checks import register, Tags, Warning, Error
 from django.conf import settings
@@ -51,11 +50,15 @@ def check_hashers(app_configs, **kwargs):
 
 
 class MakePasswordVisitor(ast.NodeVisitor):
-    def __init__(self):
+    tokens = utils.register_tokens(b"make_password")
+    names = utils.QualifiedNames("django.contrib.auth.hashers.make_password")
+
+    def __init__(self, symbols):
         self.nodes = []
+        self.symbols = symbols
 
     def visit_Call(self, node):
-        if isinstance(node.func, ast.Name) and node.func.id == "make_password":
+        if self.symbols.resolve(node.func) in self.names:
             if len(node.args) > 1:
                 self.nodes.append(node)
             else:
@@ -64,28 +67,34 @@ class MakePasswordVisitor(ast.NodeVisitor):
                         self.nodes.append(node)
                         break
 
+        self.generic_visit(node)
+
 
 @register(Tags.security)
+@utils.app_scoped
 def check_make_password(app_configs, **kwargs):
-    errors = []
+    findings = []
     for app in utils.list_apps(app_configs):
-        for path in Path(app.path).rglob("*.py"):
-            with path.open() as fp:
-                module = ast.parse(fp.read())
-                visitor = MakePasswordVisitor()
-                visitor.visit(module)
-                for node in visitor.nodes:
-                    errors.append(
-                        Warning(
-                            (
-                                f"{app.name} usa make_password "
-                                "con salt o hasher esplicito"
-                            ),
+        for path in utils.iter_app_files(
+            app, "*.py", MakePasswordVisitor.tokens
+        ):
+            module = utils.parse_file(path)
+            visitor = MakePasswordVisitor(utils.get_symbols(module, path))
+            visitor.visit(module)
+            for node in visitor.nodes:
+                findings.append(
+                    utils.locate_node(
+                        utils.Finding(
+                            Warning,
+                            "{} usa make_password con salt o hasher esplicito",
+                            app.name,
                             id="simc_djangochecks.W023",
-                        )
+                        ),
+                        path, module, node,
                     )
+                )
 
-    return errors
+    return utils.to_messages(findings)
 
 
 @register(Tags.security)
@@ -134,36 +143,46 @@ def check_password_validators(app_configs, **kwargs):
 
 
 class AuthenticateVisitor(ast.NodeVisitor):
-    def __init__(self):
+    tokens = utils.register_tokens(b"authenticate")
+    names = utils.QualifiedNames("django.contrib.auth.authenticate")
+
+    def __init__(self, symbols):
         self.nodes = []
+        self.symbols = symbols
 
     def visit_Call(self, node):
-        if isinstance(node.func, ast.Name) and node.func.id == "authenticate":
+        if self.symbols.resolve(node.func) in self.names:
             self.nodes.append(node)
 
+        self.generic_visit(node)
+
 
 @register(Tags.security)
+@utils.app_scoped
 def check_authenticate(app_configs, **kwargs):
-    errors = []
+    findings = []
     for app in utils.list_apps(app_configs):
-        for path in Path(app.path).rglob("*.py"):
-            with path.open() as fp:
-                module = ast.parse(fp.read())
-                visitor = AuthenticateVisitor()
-                visitor.visit(module)
-                for node in visitor.nodes:
-                    errors.append(
-                        Warning(
-                            (
-                                f"{app.name} usa il metodo 'authenticate' "
-                                "direttamente"
-                            ),
+        for path in utils.iter_app_files(
+            app, "*.py", AuthenticateVisitor.tokens
+        ):
+            module = utils.parse_file(path)
+            visitor = AuthenticateVisitor(utils.get_symbols(module, path))
+            visitor.visit(module)
+            for node in visitor.nodes:
+                findings.append(
+                    utils.locate_node(
+                        utils.Finding(
+                            Warning,
+                            "{} usa il metodo 'authenticate' direttamente",
+                            app.name,
                             hint="Usa LoginView",
-                            id="simc_djangochecks.W026"
-                        )
+                            id="simc_djangochecks.W026",
+                        ),
+                        path, module, node,
                     )
+                )
 
-    return errors
+    return utils.to_messages(findings)
 
 
 @register(Tags.security)
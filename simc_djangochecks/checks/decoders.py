@@ -1,76 +1,78 @@
-import ast
-from pathlib import Path
-
 from django.core.checks import register, Tags, Error
 
 from simc_djangochecks import utils
 
 
-class PickleVisitor(ast.NodeVisitor):
-    def __init__(self):
-        self.found = False
+class ImportVisitor:
+    def __init__(self, symbols):
+        self.nodes = []
+        self.symbols = symbols
 
-    def visit_Import(self, node):
-        for name in node.names:
-            if name.name == "pickle":
+    def visit(self, module):
+        for node, qualname in self.symbols.imports:
+            if qualname in self.names and node not in self.nodes:
                 self.nodes.append(node)
 
-    def visit_ImportFrom(self, node):
-        if node.module == "pickle":
-            self.nodes.append(node)
+
+class PickleVisitor(ImportVisitor):
+    tokens = utils.register_tokens(b"pickle")
+    names = utils.QualifiedNames("pickle", "pickle.*", "_pickle")
 
 
 @register(Tags.security)
+@utils.app_scoped
 def check_pickle(app_configs, **kwargs):
-    errors = []
+    findings = []
     for app in utils.list_apps(app_configs):
-        for path in Path(app.path).rglob("*.py"):
-            with path.open() as fp:
-                node = ast.parse(fp.read())
-                visitor = PickleVisitor()
-                visitor.visit(node)
-                for node in visitor.nodes:
-                    errors.append(
-                        Error(
+        for path in utils.iter_app_files(app, "*.py", PickleVisitor.tokens):
+            module = utils.parse_file(path)
+            visitor = PickleVisitor(utils.get_symbols(module, path))
+            visitor.visit(module)
+            for node in visitor.nodes:
+                findings.append(
+                    utils.locate_node(
+                        utils.Finding(
+                            Error,
                             "Il modulo pickle è sconsigliato",
                             hint="Usare un altro formato",
                             id="simc_djangochecks.E001",
-                        )
+                        ),
+                        path, module, node,
                     )
+                )
 
-    return errors
-
+    return utils.to_messages(findings)
 
-class XmlVisitor(ast.NodeVisitor):
-    def __init__(self):
-        self.found = False
 
-    def visit_Import(self, node):
-        for name in node.names:
-            if name.name == "xml":
-                self.found = True
-
-    def visit_ImportFrom(self, node):
-        if node.module == "xml":
-            self.found = True
+class XmlVisitor(ImportVisitor):
+    tokens = utils.register_tokens(b"xml")
+    names = utils.QualifiedNames("xml", "xml.*")
 
 
 @register(Tags.security)
+@utils.app_scoped
 def check_xml(app_configs, **kwargs):
-    errors = []
+    findings = []
 
     for app in utils.list_apps(app_configs):
-        for path in Path(app.path).rglob("*.py"):
-            with path.open() as fp:
-                node = ast.parse(fp.read())
-                if XmlVisitor().visit(node).found:
-                    errors.append(
-                        Error(
+        for path in utils.iter_app_files(app, "*.py", XmlVisitor.tokens):
+            module = utils.parse_file(path)
+            visitor = XmlVisitor(utils.get_symbols(module, path))
+            visitor.visit(module)
+            for node in visitor.nodes:
+                findings.append(
+                    utils.locate_node(
+                        utils.Finding(
+                            Error,
                             "Il modulo xml è sconsigliato",
                             hint=(
                                 "Usare un altro formato oppure la libreria "
                                 "defusedxml"
                             ),
                             id="simc_djangochecks.E002",
-                        )
+                        ),
+                        path, module, node,
                     )
+                )
+
+    return utils.to_messages(findings)
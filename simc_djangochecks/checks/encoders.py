@@ -1,5 +1,4 @@
 import ast
-from pathlib import Path
 
 from django.core.checks import register, Tags, Warning
 
@@ -7,28 +6,41 @@ from simc_djangochecks import utils
 
 
 class MarkSafeVisitor(ast.NodeVisitor):
-    def __init__(self):
+    tokens = utils.register_tokens(b"mark_safe")
+    names = utils.QualifiedNames("django.utils.safestring.mark_safe")
+
+    def __init__(self, symbols):
         self.nodes = []
+        self.symbols = symbols
 
     def visit_Call(self, node):
-        if isinstance(node.func, ast.Name) and node.func.id == "mark_safe":
+        if self.symbols.resolve(node.func) in self.names:
             self.nodes.append(node)
 
+        self.generic_visit(node)
+
 
 @register(Tags.security)
+@utils.app_scoped
 def check_mark_safe(app_configs, **kwargs):
-    errors = []
+    findings = []
 
     for app in utils.list_apps(app_configs):
-        for path in Path(app.path).rglob("*.py"):
-            with path.open() as fp:
-                module = ast.parse(fp.read())
-                visitor = MarkSafeVisitor()
-                visitor.visit(module)
-                for node in visitor.nodes:
-                    errors.append(
-                        Warning(f"{app.name} usa mark_safe"),
-                        id="simc_djangochecks.W020",
+        for path in utils.iter_app_files(app, "*.py", MarkSafeVisitor.tokens):
+            module = utils.parse_file(path)
+            visitor = MarkSafeVisitor(utils.get_symbols(module, path))
+            visitor.visit(module)
+            for node in visitor.nodes:
+                findings.append(
+                    utils.locate_node(
+                        utils.Finding(
+                            Warning,
+                            "{} usa mark_safe",
+                            app.name,
+                            id="simc_djangochecks.W020",
+                        ),
+                        path, module, node,
                     )
+                )
 
-    return errors
+    return utils.to_messages(findings)
@@ -113,16 +113,23 @@ def check_form_fields(form_name, form_obj):
     return errors
 
 
+def list_forms(app):
+    try:
+        module = importlib.import_module(f"{app.name}.forms")
+    except ModuleNotFoundError:
+        return
+
+    for name, obj in inspect.getmembers(module):
+        if inspect.isclass(obj) and hasattr(obj, "declared_fields"):
+            yield name, obj
+
+
 @register(Tags.security)
+@utils.app_scoped
 def check_forms_fields(app_configs, **kwargs):
     errors = []
     for app in utils.list_apps(app_configs):
-        modulename = f"{app.name}.forms"
-        try:
-            module = importlib.import_module(modulename)
-            for name, obj in inspect.getmembers(module):
-                if inspect.isclass(obj) and hasattr(obj, "declared_fields"):
-                    errors += check_form_fields(name, obj)
-        except ModuleNotFoundError:
-            pass
+        for name, obj in list_forms(app):
+            errors += check_form_fields(name, obj)
+
     return errors
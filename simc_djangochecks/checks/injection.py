@@ -1,41 +1,50 @@
 import ast
-from pathlib import Path
 
-from django.core.checks import register, Tags, Error
+from django.core.checks import register, Tags, Error, Warning
 
-from simc_djangochecks import utils
+from simc_djangochecks import taint, utils
 
 
 class ForbiddenCallVisitor(ast.NodeVisitor):
-    def __init__(self, name):
+    tokens = utils.register_tokens(b"exec", b"eval")
+
+    def __init__(self, symbols, name):
         self.nodes = []
-        self.name = name
+        self.symbols = symbols
+        self.name = f"builtins.{name}"
 
     def visit_Call(self, node):
-        if (
-            isinstance(node.func, ast.Name)
-            and node.func.id == self.name
-        ):
+        if self.symbols.resolve(node.func) == self.name:
             self.nodes.append(node)
 
+        self.generic_visit(node)
+
 
 class RawSQLVisitor(ast.NodeVisitor):
-    def __init__(self):
+    tokens = utils.register_tokens(b"RawSQL")
+    names = utils.QualifiedNames(
+        "django.db.models.RawSQL",
+        "django.db.models.expressions.RawSQL",
+    )
+
+    def __init__(self, symbols):
         self.nodes = []
+        self.symbols = symbols
 
-    def visit_Call(self, node):
-        if (
-            isinstance(node.func, ast.Name)
-            and node.func.id == "RawSQL"
-        ):
+    def visit_Name(self, node):
+        if self.symbols.resolve(node) in self.names:
             self.nodes.append(node)
 
     def visit_Attribute(self, node):
-        if node.attr == "RawSQL":
+        if self.symbols.resolve(node) in self.names:
             self.nodes.append(node)
+        else:
+            self.generic_visit(node)
 
 
 class ExtraVisitor(ast.NodeVisitor):
+    tokens = utils.register_tokens(b"extra")
+
     def __init__(self):
         self.nodes = []
 
@@ -43,86 +52,267 @@ class ExtraVisitor(ast.NodeVisitor):
         if node.arg in ("extra", "extra_content"):
             self.nodes.append(node)
 
+        self.generic_visit(node)
+
+
+TAINTED_IDS = {
+    "exec": "simc_djangochecks.E088",
+    "eval": "simc_djangochecks.E088",
+    "RawSQL": "simc_djangochecks.E089",
+    "extra": "simc_djangochecks.E090",
+}
+
+
+def get_sink_finding(tainted, app, path, node, kind, msg, id):
+    trace = tainted.get((str(path), node.lineno, kind))
+    if trace is not None:
+        return utils.Finding(
+            Error,
+            "{} usa {} con dati della richiesta ({})",
+            app.name,
+            kind,
+            trace,
+            hint="Validare i dati o usare query parametrizzate",
+            id=TAINTED_IDS[kind],
+        )
+
+    if utils.get_setting("TAINT_ONLY", False):
+        return None
+
+    return utils.Finding(Error, msg, app.name, kind, id=id)
+
 
 @register(Tags.security)
+@utils.app_scoped
 def check_exec(app_configs, **kwargs):
-    errors = []
+    findings = []
+    tainted = taint.get_tainted_sinks(app_configs)
 
     for app in utils.list_apps(app_configs):
-        for path in Path(app.path).rglob("*.py"):
-            with path.open() as fp:
-                module = ast.parse(fp.read())
-                for id, call in (
-                    ("E009", "exec"),
-                    ("E010", "eval"),
-                ):
-                    visitor = ForbiddenCallVisitor(call)
-                    visitor.visit(module)
-                    for node in visitor.nodes:
-                        errors.append(
-                            Error(
-                                f"{app.name} usa {call}",
-                                id=id,
-                            )
+        for path in utils.iter_app_files(
+            app, "*.py", ForbiddenCallVisitor.tokens
+        ):
+            module = utils.parse_file(path)
+            symbols = utils.get_symbols(module, path)
+            for id, call in (
+                ("E009", "exec"),
+                ("E010", "eval"),
+            ):
+                visitor = ForbiddenCallVisitor(symbols, call)
+                visitor.visit(module)
+                for node in visitor.nodes:
+                    finding = get_sink_finding(
+                        tainted, app, path, node, call, "{} usa {}", id
+                    )
+                    if finding is not None:
+                        findings.append(
+                            utils.locate_node(finding, path, module, node)
                         )
 
-    return errors
+    return utils.to_messages(findings)
 
 
 @register(Tags.security)
+@utils.app_scoped
 def check_sqlinjection(app_configs, **kwargs):
-    errors = []
+    findings = []
+    tainted = taint.get_tainted_sinks(app_configs)
 
     for app in utils.list_apps(app_configs):
-        for path in Path(app.path).rglob("*.py"):
-            with path.open() as fp:
-                module = ast.parse(fp.read())
+        for path in utils.iter_app_files(
+            app, "*.py", RawSQLVisitor.tokens | ExtraVisitor.tokens
+        ):
+            module = utils.parse_file(path)
 
-                visitor = RawSQLVisitor()
-                visitor.visit(module)
-                for node in visitor.nodes:
-                    errors.append(
-                        Error(
-                            f"{app.name} usa RawSQL",
-                            id="E011",
-                        )
+            visitor = RawSQLVisitor(utils.get_symbols(module, path))
+            visitor.visit(module)
+            for node in visitor.nodes:
+                finding = get_sink_finding(
+                    tainted, app, path, node, "RawSQL", "{} usa RawSQL",
+                    "E011",
+                )
+                if finding is not None:
+                    findings.append(
+                        utils.locate_node(finding, path, module, node)
                     )
 
-                visitor = ExtraVisitor()
-                visitor.visit(module)
-                for node in visitor.nodes:
-                    errors.append(
-                        Error(
-                            f"{app.name} usa extra/extra_content",
-                            id="E012",
-                        )
+            visitor = ExtraVisitor()
+            visitor.visit(module)
+            for node in visitor.nodes:
+                finding = get_sink_finding(
+                    tainted, app, path, node, "extra",
+                    "{} usa extra/extra_content", "E012",
+                )
+                if finding is not None:
+                    findings.append(
+                        utils.locate_node(finding, path, module, node)
                     )
 
-    return errors
+    return utils.to_messages(findings)
 
 
 class ShellVisitor(ast.NodeVisitor):
-    def __init__(self):
+    tokens = utils.register_tokens(b"shell", b"system", b"popen")
+    # Funzioni che eseguono sempre il comando tramite la shell
+    names = utils.QualifiedNames("os.system", "os.popen")
+
+    def __init__(self, symbols):
         self.nodes = []
+        self.symbols = symbols
+
+    def visit_Call(self, node):
+        # La tabella dei simboli risolve gli alias (from os import system)
+        qualname = self.symbols.resolve(node.func)
+        if qualname in self.names:
+            self.nodes.append((node, qualname))
+
+        self.generic_visit(node)
 
     def visit_keyword(self, node):
         if node.arg == "shell":
-            self.nodes.append(node)
+            self.nodes.append((node, "shell=True"))
+
+        self.generic_visit(node)
 
 
 @register(Tags.security)
+@utils.app_scoped
 def check_shell_true(app_configs, **kwargs):
-    errors = []
+    findings = []
 
     for app in utils.list_apps(app_configs):
-        for path in Path(app.path).rglob("*.py"):
-            with path.open() as fp:
-                module = ast.parse(fp.read())
-                visitor = ShellVisitor()
-                visitor.visit(module)
-                for node in visitor.nodes:
-                    errors.append(
-                        Error(f"{app.name} usa shell=True", id="E013")
+        for path in utils.iter_app_files(app, "*.py", ShellVisitor.tokens):
+            module = utils.parse_file(path)
+            visitor = ShellVisitor(utils.get_symbols(module, path))
+            visitor.visit(module)
+            for node, name in visitor.nodes:
+                findings.append(
+                    utils.locate_node(
+                        utils.Finding(
+                            Error, "{} usa {}", app.name, name, id="E013"
+                        ),
+                        path, module, node,
+                    )
+                )
+
+    return utils.to_messages(findings)
+
+
+# nome qualificato -> posizione dell'argomento timeout (None se solo keyword)
+TIMEOUT_CALLS = {
+    "requests.request": None,
+    "requests.get": None,
+    "requests.options": None,
+    "requests.head": None,
+    "requests.post": None,
+    "requests.put": None,
+    "requests.patch": None,
+    "requests.delete": None,
+    "requests.api.request": None,
+    "urllib.request.urlopen": 2,
+    "smtplib.SMTP": 3,
+    "smtplib.SMTP_SSL": None,
+    "smtplib.LMTP": None,
+    "socket.create_connection": 1,
+    "subprocess.run": None,
+    "subprocess.call": None,
+    "subprocess.check_call": None,
+    "subprocess.check_output": None,
+}
+
+# httpx ha un timeout di default: è un problema solo se disabilitato
+HTTPX_CALLS = utils.QualifiedNames(
+    "httpx.request",
+    "httpx.get",
+    "httpx.options",
+    "httpx.head",
+    "httpx.post",
+    "httpx.put",
+    "httpx.patch",
+    "httpx.delete",
+    "httpx.stream",
+    "httpx.Client",
+    "httpx.AsyncClient",
+)
+
+
+def is_none(node):
+    return isinstance(node, ast.Constant) and node.value is None
+
+
+class TimeoutVisitor(ast.NodeVisitor):
+    tokens = utils.register_tokens(
+        b"requests",
+        b"httpx",
+        b"urlopen",
+        b"smtplib",
+        b"create_connection",
+        b"subprocess",
+    )
+
+    def __init__(self, symbols):
+        self.nodes = []
+        self.symbols = symbols
+
+    def get_timeout(self, node, position):
+        for keyword in node.keywords:
+            if keyword.arg == "timeout":
+                return keyword.value
+
+            # **kwargs potrebbe contenere il timeout
+            if keyword.arg is None:
+                return keyword.value
+
+        if position is not None and len(node.args) > position:
+            return node.args[position]
+
+        return None
+
+    def visit_Call(self, node):
+        qualname = self.symbols.resolve(node.func)
+        if qualname in TIMEOUT_CALLS:
+            timeout = self.get_timeout(node, TIMEOUT_CALLS[qualname])
+            if timeout is None or is_none(timeout):
+                self.nodes.append((node, qualname))
+        elif qualname in HTTPX_CALLS:
+            timeout = self.get_timeout(node, None)
+            if timeout is not None and is_none(timeout):
+                self.nodes.append((node, qualname))
+
+        self.generic_visit(node)
+
+
+@register(utils.PERFORMANCE_TAG)
+@utils.app_scoped
+def check_outbound_timeout(app_configs, **kwargs):
+    findings = []
+    request_path_files = utils.get_request_path_files(app_configs)
+
+    for app in utils.list_apps(app_configs):
+        for path in utils.iter_app_files(app, "*.py", TimeoutVisitor.tokens):
+            if path not in request_path_files:
+                continue
+
+            module = utils.parse_file(path)
+            visitor = TimeoutVisitor(utils.get_symbols(module, path))
+            visitor.visit(module)
+            for node, qualname in visitor.nodes:
+                findings.append(
+                    utils.locate_node(
+                        utils.Finding(
+                            Warning,
+                            "{}:{} chiamata a {} senza timeout",
+                            path,
+                            node.lineno,
+                            qualname,
+                            hint=(
+                                "Imposta timeout=...: un servizio esterno "
+                                "lento blocca i worker"
+                            ),
+                            id="simc_djangochecks.W093",
+                        ),
+                        path, module, node,
                     )
+                )
 
-    return errors
+    return utils.to_messages(findings)
@@ -0,0 +1,258 @@
+import ast
+import re
+
+from django.core.checks import register, Info, Warning
+
+from simc_djangochecks import utils
+
+
+LOG_METHODS = (
+    "debug",
+    "info",
+    "warning",
+    "warn",
+    "error",
+    "exception",
+    "critical",
+    "log",
+)
+
+
+# log, logger, _log, LOGGER, audit_logger, ... ma non catalog o blog
+LOGGER_NAME_REGEX = re.compile(r"^_*(\w+_)?(log|logger)$", re.IGNORECASE)
+
+LOGGER_FACTORIES = utils.QualifiedNames(
+    "logging.getLogger",
+    "logging.LoggerAdapter",
+)
+
+
+def get_name(node):
+    if isinstance(node, ast.Attribute):
+        return node.attr
+
+    if isinstance(node, ast.Name):
+        return node.id
+
+    return None
+
+
+def is_logger(node, symbols, loggers):
+    # logging.info(...), logger.info(...), self.log.info(...)
+    qualname = symbols.resolve(node)
+    if qualname is not None and qualname.split(".")[0] == "logging":
+        return True
+
+    name = get_name(node)
+    if name is None:
+        return False
+
+    return name in loggers or LOGGER_NAME_REGEX.match(name) is not None
+
+
+def is_string(node):
+    return isinstance(node, ast.JoinedStr) or (
+        isinstance(node, ast.Constant) and isinstance(node.value, str)
+    )
+
+
+def is_constant_string(node):
+    # "a" "b", "a" + "b": non c'è nessun valore da formattare
+    if isinstance(node, ast.Constant):
+        return isinstance(node.value, str)
+
+    if isinstance(node, ast.JoinedStr):
+        return not any(
+            isinstance(value, ast.FormattedValue) for value in node.values
+        )
+
+    return (
+        isinstance(node, ast.BinOp)
+        and isinstance(node.op, ast.Add)
+        and is_constant_string(node.left)
+        and is_constant_string(node.right)
+    )
+
+
+def get_eager_format(node):
+    if isinstance(node, ast.JoinedStr) and any(
+        isinstance(value, ast.FormattedValue) for value in node.values
+    ):
+        return "f-string"
+
+    if isinstance(node, ast.BinOp):
+        if isinstance(node.op, ast.Mod) and is_string(node.left):
+            return "%"
+
+        if (
+            isinstance(node.op, ast.Add)
+            and not is_constant_string(node)
+            and (
+                is_string(node.left)
+                or is_string(node.right)
+                or get_eager_format(node.left)
+                or get_eager_format(node.right)
+            )
+        ):
+            return "concatenazione"
+
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and node.func.attr == "format"
+        and is_string(node.func.value)
+    ):
+        return "format()"
+
+    return None
+
+
+def get_lazy_call(node):
+    # Argomenti equivalenti con formattazione differita, se ricavabili
+    if isinstance(node, ast.JoinedStr):
+        template = ""
+        args = []
+        for value in node.values:
+            if isinstance(value, ast.Constant):
+                template += value.value.replace("%", "%%")
+            elif value.format_spec is not None:
+                return None
+            else:
+                template += "%r" if value.conversion == ord("r") else "%s"
+                args.append(ast.unparse(value.value))
+
+        return ", ".join([repr(template)] + args)
+
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mod):
+        if isinstance(node.right, ast.Tuple):
+            args = [ast.unparse(element) for element in node.right.elts]
+        else:
+            args = [ast.unparse(node.right)]
+
+        return ", ".join([ast.unparse(node.left)] + args)
+
+    return None
+
+
+class EagerLogFormatVisitor(ast.NodeVisitor):
+    tokens = utils.register_tokens(b"log")
+
+    def __init__(self, symbols):
+        self.nodes = []
+        self.symbols = symbols
+        self.loops = 0
+        # Nomi e attributi assegnati da logging.getLogger(...)
+        self.loggers = set()
+
+    def visit_Assign(self, node):
+        if (
+            isinstance(node.value, ast.Call)
+            and self.symbols.resolve(node.value.func) in LOGGER_FACTORIES
+        ):
+            for target in node.targets:
+                name = get_name(target)
+                if name is not None:
+                    self.loggers.add(name)
+
+        self.generic_visit(node)
+
+    def visit_FunctionDef(self, node):
+        loops = self.loops
+        self.loops = 0
+        self.generic_visit(node)
+        self.loops = loops
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+    visit_Lambda = visit_FunctionDef
+
+    def visit_For(self, node):
+        self.visit(node.iter)
+        self.loops += 1
+        for stmt in node.body:
+            self.visit(stmt)
+
+        self.loops -= 1
+        for stmt in node.orelse:
+            self.visit(stmt)
+
+    visit_AsyncFor = visit_For
+
+    def visit_While(self, node):
+        self.loops += 1
+        self.generic_visit(node)
+        self.loops -= 1
+
+    def visit_ListComp(self, node):
+        self.loops += 1
+        self.generic_visit(node)
+        self.loops -= 1
+
+    visit_SetComp = visit_ListComp
+    visit_DictComp = visit_ListComp
+    visit_GeneratorExp = visit_ListComp
+
+    def visit_Call(self, node):
+        func = node.func
+        if (
+            isinstance(func, ast.Attribute)
+            and func.attr in LOG_METHODS
+            and is_logger(func.value, self.symbols, self.loggers)
+        ):
+            position = 1 if func.attr == "log" else 0
+            if len(node.args) > position:
+                message = node.args[position]
+                kind = get_eager_format(message)
+                if kind is not None:
+                    self.nodes.append(
+                        (node, func.attr, kind, message, self.loops > 0)
+                    )
+
+        self.generic_visit(node)
+
+
+@register(utils.PERFORMANCE_TAG)
+@utils.app_scoped
+def check_eager_log_format(app_configs, **kwargs):
+    findings = []
+    for app in utils.list_apps(app_configs):
+        for path in utils.iter_app_files(
+            app, "*.py", EagerLogFormatVisitor.tokens
+        ):
+            module = utils.parse_file(path)
+            visitor = EagerLogFormatVisitor(utils.get_symbols(module, path))
+            visitor.visit(module)
+            for node, method, kind, message, in_loop in visitor.nodes:
+                lazy = get_lazy_call(message)
+                if lazy is not None:
+                    if method == "log":
+                        lazy = f"{ast.unparse(node.args[0])}, {lazy}"
+
+                    hint = f"Usa .{method}({lazy})"
+                else:
+                    hint = "Passa i valori come argomenti di un messaggio %s"
+
+                if in_loop:
+                    cls, msg, id = (
+                        Warning,
+                        "{}:{} messaggio di log formattato con {} in un "
+                        "ciclo anche se il livello è disabilitato",
+                        "simc_djangochecks.W108",
+                    )
+                else:
+                    cls, msg, id = (
+                        Info,
+                        "{}:{} messaggio di log formattato con {} anche se "
+                        "il livello è disabilitato",
+                        "simc_djangochecks.I107",
+                    )
+
+                findings.append(
+                    utils.locate_node(
+                        utils.Finding(
+                            cls, msg, path, node.lineno, kind, hint=hint, id=id
+                        ),
+                        path, module, node,
+                    )
+                )
+
+    return utils.to_messages(findings)
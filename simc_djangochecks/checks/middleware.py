@@ -0,0 +1,215 @@
+import ast
+import inspect
+import textwrap
+
+from django.conf import settings
+from django.core.checks import register, Warning
+from django.utils.module_loading import import_string
+
+from simc_djangochecks import utils
+
+
+GZIP_MIDDLEWARE = "django.middleware.gzip.GZipMiddleware"
+CONDITIONAL_GET_MIDDLEWARE = "django.middleware.http.ConditionalGetMiddleware"
+SESSION_MIDDLEWARE = "django.contrib.sessions.middleware.SessionMiddleware"
+SESSION_AUTHENTICATION = "rest_framework.authentication.SessionAuthentication"
+
+CACHEABLE_DECORATORS = (
+    "cache_page",
+    "cache_control",
+    "require_GET",
+    "require_safe",
+)
+
+
+class CacheableViewVisitor(ast.NodeVisitor):
+    tokens = utils.register_tokens(
+        b"cache_page",
+        b"cache_control",
+        b"require_GET",
+        b"require_safe",
+    )
+
+    def __init__(self):
+        self.nodes = []
+
+    def visit_Name(self, node):
+        if node.id in CACHEABLE_DECORATORS:
+            self.nodes.append(node)
+
+    def visit_Attribute(self, node):
+        if node.attr in CACHEABLE_DECORATORS:
+            self.nodes.append(node)
+
+        self.generic_visit(node)
+
+
+class DatabaseAccessVisitor(ast.NodeVisitor):
+    def __init__(self):
+        self.nodes = []
+
+    def visit_Attribute(self, node):
+        if node.attr == "objects":
+            self.nodes.append(node)
+
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        if (
+            isinstance(node.func, ast.Attribute)
+            and node.func.attr in ("cursor", "raw")
+        ):
+            self.nodes.append(node)
+
+        self.generic_visit(node)
+
+
+def load_middleware():
+    middleware = []
+    for name in settings.MIDDLEWARE:
+        try:
+            middleware.append((name, import_string(name)))
+        except ImportError:
+            pass
+
+    return middleware
+
+
+def get_request_methods(obj):
+    if not inspect.isclass(obj):
+        return [obj]
+
+    return [
+        obj.__dict__[name]
+        for name in ("__call__", "process_request", "process_view")
+        if name in obj.__dict__
+    ]
+
+
+def is_api_only():
+    api_only = utils.get_setting("API_ONLY")
+    if api_only is not None:
+        return api_only
+
+    if (
+        "rest_framework" not in settings.INSTALLED_APPS
+        or "django.contrib.admin" in settings.INSTALLED_APPS
+        or "django.contrib.messages" in settings.INSTALLED_APPS
+    ):
+        return False
+
+    rest_framework = getattr(settings, "REST_FRAMEWORK", {})
+    authentication_classes = rest_framework.get(
+        "DEFAULT_AUTHENTICATION_CLASSES", [SESSION_AUTHENTICATION]
+    )
+    return SESSION_AUTHENTICATION not in authentication_classes
+
+
+def is_asgi():
+    asgi = utils.get_setting("ASGI")
+    if asgi is not None:
+        return asgi
+
+    return bool(getattr(settings, "ASGI_APPLICATION", None))
+
+
+@register(utils.PERFORMANCE_TAG)
+def check_middleware(app_configs, **kwargs):
+    errors = []
+
+    if (
+        GZIP_MIDDLEWARE in settings.MIDDLEWARE
+        and settings.MIDDLEWARE[0] != GZIP_MIDDLEWARE
+    ):
+        errors.append(
+            Warning(
+                f"{GZIP_MIDDLEWARE} non è il primo middleware in MIDDLEWARE",
+                hint=(
+                    "Il middleware prima di GZipMiddleware lavora sulla "
+                    "risposta non compressa"
+                ),
+                id="simc_djangochecks.W079",
+            )
+        )
+
+    if CONDITIONAL_GET_MIDDLEWARE not in settings.MIDDLEWARE:
+        cacheable_views = 0
+        for app in utils.list_apps(app_configs):
+            for path in utils.iter_app_files(
+                app, "views.py", CacheableViewVisitor.tokens
+            ):
+                visitor = CacheableViewVisitor()
+                visitor.visit(utils.parse_file(path))
+                cacheable_views += len(visitor.nodes)
+
+        if cacheable_views:
+            errors.append(
+                Warning(
+                    (
+                        f"{CONDITIONAL_GET_MIDDLEWARE} non presente in "
+                        "MIDDLEWARE con viste GET cacheable "
+                        f"({cacheable_views})"
+                    ),
+                    hint=(
+                        "ConditionalGetMiddleware risponde 304 Not Modified "
+                        "usando ETag e Last-Modified"
+                    ),
+                    id="simc_djangochecks.W080",
+                )
+            )
+
+    if SESSION_MIDDLEWARE in settings.MIDDLEWARE and is_api_only():
+        errors.append(
+            Warning(
+                f"{SESSION_MIDDLEWARE} in un progetto API stateless",
+                hint=(
+                    "SessionMiddleware legge la sessione a ogni richiesta: "
+                    "rimuovilo se non usi l'autenticazione di sessione"
+                ),
+                id="simc_djangochecks.W081",
+            )
+        )
+
+    asgi = is_asgi()
+    for name, obj in load_middleware():
+        if not name.startswith("django."):
+            for method in get_request_methods(obj):
+                try:
+                    source = textwrap.dedent(inspect.getsource(method))
+                except (OSError, TypeError):
+                    continue
+
+                visitor = DatabaseAccessVisitor()
+                visitor.visit(ast.parse(source))
+                if visitor.nodes:
+                    errors.append(
+                        utils.locate_text(
+                            Warning(
+                                (
+                                    f"Il middleware {name} accede al "
+                                    f"database in {method.__name__} a ogni "
+                                    "richiesta"
+                                ),
+                                hint=(
+                                    "Usa una cache o sposta la query nelle "
+                                    "viste"
+                                ),
+                                id="simc_djangochecks.W082",
+                            ),
+                            inspect.getsourcefile(method), source,
+                        )
+                    )
+
+        if asgi and not getattr(obj, "async_capable", False):
+            errors.append(
+                Warning(
+                    f"Il middleware {name} è solo sincrono con ASGI",
+                    hint=(
+                        "Ogni richiesta passa da un thread per eseguire il "
+                        "middleware: rendilo async_capable"
+                    ),
+                    id="simc_djangochecks.W083",
+                )
+            )
+
+    return errors
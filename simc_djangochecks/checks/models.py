@@ -91,6 +91,7 @@ def check_model_fields(model):
 
 
 @register(Tags.security)
+@utils.app_scoped
 def check_models_fields(app_configs, **kwargs):
     errors = []
     for app in utils.list_apps(app_configs):
@@ -0,0 +1,281 @@
+import os
+import re
+import time
+from contextlib import ExitStack
+
+from django.core.checks import register, Info, Warning
+from django.core.management import call_command
+from django.db import connections
+from django.db.backends.base.creation import TEST_DATABASE_PREFIX
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext,
+    get_unique_databases_and_mirrors,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from django.urls.resolvers import RegexPattern, RoutePattern
+
+from simc_djangochecks import utils
+from simc_djangochecks.checks.urls import get_sample_path
+
+SQL_LITERAL_REGEX = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def has_arguments(chain):
+    for pattern in chain:
+        if isinstance(pattern.pattern, RoutePattern):
+            if pattern.pattern.converters:
+                return True
+        elif isinstance(pattern.pattern, RegexPattern):
+            if pattern.pattern.regex.groups:
+                return True
+
+    return False
+
+
+def list_get_routes():
+    excluded = tuple(utils.get_setting("VIEW_BENCHMARK_EXCLUDE", ()))
+    for chain in utils.iter_url_patterns():
+        if has_arguments(chain):
+            continue
+
+        path = get_sample_path(chain)
+        if path is None or path.lstrip("/").startswith(excluded):
+            continue
+
+        yield path, chain[-1].lookup_str
+
+
+def count_repeated(queries, normalize=None):
+    seen = set()
+    repeated = 0
+    for query in queries:
+        sql = query["sql"]
+        if normalize is not None:
+            sql = normalize(sql)
+
+        if sql in seen:
+            repeated += 1
+        else:
+            seen.add(sql)
+
+    return repeated
+
+
+def normalize_sql(sql):
+    # Stessa query con parametri diversi, come nelle query N+1
+    return SQL_LITERAL_REGEX.sub("?", sql)
+
+
+def benchmark_view(client, path, number):
+    best = None
+    for _ in range(number):
+        with ExitStack() as stack:
+            captures = [
+                stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in connections
+            ]
+            start = time.perf_counter()
+            response = client.get(path)
+            duration = time.perf_counter() - start
+
+        if best is None or duration < best:
+            best = duration
+
+    queries = [query for capture in captures for query in capture]
+    return response, best, queries
+
+
+def get_benchmark_test_name(connection):
+    # Un nome diverso da quello dei test del progetto: autoclobber non deve
+    # cancellare un database test_<nome> esistente
+    test_name = connection.settings_dict["TEST"]["NAME"]
+    if connection.vendor == "sqlite":
+        test_name = test_name or ":memory:"
+        if connection.creation.is_in_memory_db(test_name):
+            return test_name
+    elif not test_name:
+        test_name = TEST_DATABASE_PREFIX + connection.settings_dict["NAME"]
+
+    directory, name = os.path.split(test_name)
+    return os.path.join(directory, f"simc_{name}")
+
+
+def create_test_databases(old_config):
+    # Come django.test.utils.setup_databases, ma old_config viene
+    # aggiornato a ogni database creato: in caso di errore quelli già
+    # creati vengono comunque distrutti
+    test_databases, mirrored_aliases = get_unique_databases_and_mirrors()
+    for _, aliases in test_databases.values():
+        first = connections[aliases[0]]
+        old_name = first.settings_dict["NAME"]
+        first.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        old_config.append((first, old_name, True))
+        for alias in aliases[1:]:
+            connection = connections[alias]
+            old_config.append(
+                (connection, connection.settings_dict["NAME"], False)
+            )
+            connection.creation.set_as_test_mirror(first.settings_dict)
+
+    for alias, mirror_alias in mirrored_aliases.items():
+        connections[alias].creation.set_as_test_mirror(
+            connections[mirror_alias].settings_dict
+        )
+
+
+@register(utils.PERFORMANCE_TAG, deploy=True)
+@utils.serial
+def check_view_budget(app_configs, **kwargs):
+    errors = []
+    if not utils.get_setting("VIEW_BENCHMARK", False):
+        return errors
+
+    # Il benchmark non dipende dai file analizzati: con lo sharding viene
+    # eseguito solo dal primo shard
+    shard = utils.get_shard()
+    if shard is not None and shard[0] != 1:
+        return errors
+
+    query_budget = utils.get_setting("VIEW_QUERY_BUDGET", 20)
+    latency_budget = utils.get_setting("VIEW_LATENCY_BUDGET", 0.5)
+    similar_threshold = utils.get_setting("VIEW_SIMILAR_QUERIES", 5)
+    number = utils.get_setting("VIEW_BENCHMARK_NUMBER", 3)
+
+    try:
+        setup_test_environment()
+    except RuntimeError:
+        # Già in un ambiente di test (ad esempio durante i test)
+        return errors
+
+    # NAME e TEST vengono modificati per tutti gli alias, anche per i mirror
+    old_settings = {
+        alias: (
+            connections[alias].settings_dict["NAME"],
+            dict(connections[alias].settings_dict["TEST"]),
+        )
+        for alias in connections
+    }
+    old_config = []
+    results = []
+    try:
+        for alias in connections:
+            test = connections[alias].settings_dict["TEST"]
+            if not test["MIRROR"]:
+                test["NAME"] = get_benchmark_test_name(connections[alias])
+
+        create_test_databases(old_config)
+        fixtures = utils.get_setting("VIEW_BENCHMARK_FIXTURES", ())
+        if fixtures:
+            call_command("loaddata", *fixtures, verbosity=0)
+
+        client = Client(raise_request_exception=False)
+        for path, view in list_get_routes():
+            try:
+                response, duration, queries = benchmark_view(
+                    client, path, number
+                )
+            except Exception as e:
+                errors.append(
+                    Warning(
+                        (
+                            f"GET {path} ({view}) solleva "
+                            f"{type(e).__name__}"
+                        ),
+                        hint=repr(e),
+                        id="simc_djangochecks.W113",
+                    )
+                )
+                continue
+
+            results.append((path, view, response, duration, queries))
+    except Exception as e:
+        errors.append(
+            Warning(
+                (
+                    "Benchmark delle viste non eseguibile: "
+                    f"{type(e).__name__}"
+                ),
+                hint=str(e),
+                id="simc_djangochecks.W120",
+            )
+        )
+    finally:
+        try:
+            teardown_databases(old_config, verbosity=0)
+        finally:
+            for alias, (name, test) in old_settings.items():
+                connection = connections[alias]
+                connection.close()
+                connection.settings_dict["NAME"] = name
+                connection.settings_dict["TEST"] = test
+
+            teardown_test_environment()
+
+    results.sort(key=lambda result: (-len(result[4]), -result[3]))
+    for path, view, response, duration, queries in results:
+        duplicates = count_repeated(queries)
+        similar = count_repeated(queries, normalize_sql)
+        # I valori misurati sono nell'hint: il messaggio resta stabile per
+        # la baseline e per l'unione degli shard
+        detail = (
+            f"{response.status_code}, {len(queries)} query "
+            f"({duplicates} duplicate, {similar} simili), "
+            f"{duration * 1000:.1f} ms, "
+            f"{utils.format_size(len(response.content))}"
+        )
+        errors.append(
+            Info(
+                f"GET {path} ({view})",
+                hint=detail,
+                id="simc_djangochecks.I109",
+            )
+        )
+
+        if len(queries) > query_budget:
+            errors.append(
+                Warning(
+                    (
+                        f"GET {path} ({view}) supera il budget di "
+                        f"{query_budget} query"
+                    ),
+                    hint=(
+                        f"{len(queries)} query. Usa "
+                        "select_related/prefetch_related"
+                    ),
+                    id="simc_djangochecks.W110",
+                )
+            )
+
+        if duration > latency_budget:
+            errors.append(
+                Warning(
+                    (
+                        f"GET {path} ({view}) supera il budget di "
+                        f"{latency_budget * 1000:.0f} ms"
+                    ),
+                    hint=f"{duration * 1000:.1f} ms",
+                    id="simc_djangochecks.W111",
+                )
+            )
+
+        if similar >= similar_threshold:
+            errors.append(
+                Warning(
+                    (
+                        f"GET {path} ({view}) ripete la stessa query con "
+                        "parametri diversi: possibile query N+1"
+                    ),
+                    hint=(
+                        f"{similar} query ripetute. Usa "
+                        "select_related/prefetch_related"
+                    ),
+                    id="simc_djangochecks.W112",
+                )
+            )
+
+    return errors
@@ -0,0 +1,407 @@
+import json
+import subprocess
+import sys
+import time
+
+from django.core.checks import register, Tags, Error, Warning
+from django.core.validators import RegexValidator
+from django.urls.resolvers import RegexPattern
+
+from simc_djangochecks import utils
+from simc_djangochecks.checks.forms import list_forms
+
+try:
+    from re import _constants as constants, _parser as parser
+except ImportError:
+    import sre_constants as constants
+    import sre_parse as parser
+
+
+# Alfabeto usato per approssimare gli insiemi di caratteri: ASCII più una
+# lettera, una cifra e uno spazio non ASCII
+UNIVERSE = frozenset(chr(i) for i in range(128)) | {"à", "٠", " "}
+
+REPEATS = (constants.MAX_REPEAT, constants.MIN_REPEAT)
+
+# Quantificatori possessivi e gruppi atomici esistono solo da Python 3.11
+POSSESSIVE_REPEAT = getattr(constants, "POSSESSIVE_REPEAT", None)
+ATOMIC_GROUP = getattr(constants, "ATOMIC_GROUP", None)
+
+# Oltre questo numero di ripetizioni un quantificatore è considerato
+# illimitato
+UNBOUNDED_REPEAT = 32
+
+CATEGORY_PREDICATES = {
+    "DIGIT": str.isdecimal,
+    "WORD": lambda c: c.isalnum() or c == "_",
+    "SPACE": str.isspace,
+    "LINEBREAK": lambda c: c == "\n",
+}
+
+FUZZ_SCRIPT = (
+    "import json, re, sys\n"
+    "pattern, flags, attacks = json.load(sys.stdin)\n"
+    "regex = re.compile(pattern, flags)\n"
+    "for attack in attacks:\n"
+    "    regex.search(attack)\n"
+)
+
+
+def get_category(category):
+    name = str(category)
+    for key, predicate in CATEGORY_PREDICATES.items():
+        if key in name:
+            chars = {c for c in UNIVERSE if predicate(c)}
+            return UNIVERSE - chars if "NOT" in name else chars
+
+    return set(UNIVERSE)
+
+
+def get_class(items):
+    chars = set()
+    negate = False
+    for op, av in items:
+        if op == constants.NEGATE:
+            negate = True
+        elif op == constants.LITERAL:
+            chars.add(chr(av))
+        elif op == constants.RANGE:
+            low, high = av
+            chars |= {c for c in UNIVERSE if low <= ord(c) <= high}
+        elif op == constants.CATEGORY:
+            chars |= get_category(av)
+
+    return UNIVERSE - chars if negate else chars
+
+
+def get_first(seq):
+    # Caratteri con cui può iniziare un match e se il match può essere vuoto
+    first = set()
+    for op, av in seq:
+        chars, nullable = get_item_first(op, av)
+        first |= chars
+        if not nullable:
+            return first, False
+
+    return first, True
+
+
+def get_item_first(op, av):
+    if op == constants.LITERAL:
+        return {chr(av)}, False
+
+    if op == constants.NOT_LITERAL:
+        return UNIVERSE - {chr(av)}, False
+
+    if op == constants.ANY:
+        return UNIVERSE - {"\n"}, False
+
+    if op == constants.IN:
+        return get_class(av), False
+
+    if op == constants.SUBPATTERN:
+        return get_first(av[-1])
+
+    if op == constants.BRANCH:
+        first = set()
+        nullable = False
+        for branch in av[1]:
+            chars, branch_nullable = get_first(branch)
+            first |= chars
+            nullable = nullable or branch_nullable
+
+        return first, nullable
+
+    if op in REPEATS or op == POSSESSIVE_REPEAT:
+        chars, nullable = get_first(av[2])
+        return chars, nullable or av[0] == 0
+
+    if op == ATOMIC_GROUP:
+        return get_first(av)
+
+    return set(), True
+
+
+def get_chars(seq):
+    # Tutti i caratteri che il pattern può consumare
+    chars = set()
+    for op, av in seq:
+        if op in (
+            constants.LITERAL,
+            constants.NOT_LITERAL,
+            constants.ANY,
+            constants.IN,
+        ):
+            chars |= get_item_first(op, av)[0]
+        else:
+            for sub in get_subpatterns(op, av):
+                chars |= get_chars(sub)
+
+    return chars
+
+
+def get_atom_chars(seq):
+    # Caratteri di un pattern di un solo carattere, come \d o [a-z]
+    if len(seq) == 1:
+        op, av = seq[0]
+        if op in (
+            constants.LITERAL,
+            constants.NOT_LITERAL,
+            constants.ANY,
+            constants.IN,
+        ):
+            return get_item_first(op, av)[0]
+
+    return set()
+
+
+def get_subpatterns(op, av):
+    if op == constants.SUBPATTERN:
+        return [av[-1]]
+
+    if op == constants.BRANCH:
+        return av[1]
+
+    if op in REPEATS or op == POSSESSIVE_REPEAT:
+        return [av[2]]
+
+    if op == ATOMIC_GROUP:
+        return [av]
+
+    if op in (constants.ASSERT, constants.ASSERT_NOT):
+        return [av[1]]
+
+    if op == constants.GROUPREF_EXISTS:
+        return [sub for sub in av[1:] if sub is not None]
+
+    return []
+
+
+def get_repeat(op, av, bounded=False):
+    # Quantificatore illimitato (con bounded, anche limitato ma con un
+    # numero variabile di ripetizioni), anche dentro un gruppo con un solo
+    # elemento
+    while op == constants.SUBPATTERN and len(av[-1]) == 1:
+        op, av = av[-1][0]
+
+    if op in REPEATS and (
+        av[1] > av[0] if bounded else av[1] >= UNBOUNDED_REPEAT
+    ):
+        return av
+
+    return None
+
+
+def iter_tail_repeats(seq, bounded=False):
+    # Quantificatori che possono consumare la fine di seq
+    for op, av in reversed(list(seq)):
+        repeat = get_repeat(op, av, bounded)
+        if repeat is not None:
+            yield repeat
+        elif op == constants.SUBPATTERN:
+            yield from iter_tail_repeats(av[-1], bounded)
+        elif op == constants.BRANCH:
+            for branch in av[1]:
+                yield from iter_tail_repeats(branch, bounded)
+
+        if not get_item_first(op, av)[1]:
+            return
+
+
+def sample(seq, at_least=0):
+    # Una stringa (breve) che corrisponde a seq: ogni quantificatore viene
+    # ripetuto il minimo indispensabile, ma almeno at_least volte se può
+    text = ""
+    for op, av in seq:
+        if op == constants.LITERAL:
+            text += chr(av)
+        elif op in (constants.NOT_LITERAL, constants.ANY, constants.IN):
+            text += pick(get_item_first(op, av)[0])
+        elif op == constants.SUBPATTERN:
+            text += sample(av[-1], at_least)
+        elif op == constants.BRANCH:
+            text += sample(av[1][0], at_least)
+        elif op in REPEATS or op == POSSESSIVE_REPEAT:
+            count = max(av[0], min(at_least, av[1]))
+            text += sample(av[2], at_least) * count
+        elif op == ATOMIC_GROUP:
+            text += sample(av, at_least)
+
+    return text
+
+
+def sample_regex(pattern, at_least=0):
+    return sample(parser.parse(pattern), at_least)
+
+
+def pick(chars):
+    return min(chars, key=lambda c: (not c.isalnum(), c)) if chars else ""
+
+
+def analyse_sequence(seq, prefix, problems):
+    items = list(seq)
+    for index, (op, av) in enumerate(items):
+        repeat = get_repeat(op, av)
+        if repeat is not None:
+            body = repeat[2]
+            body_first = get_first(body)[0]
+            # Sotto un quantificatore illimitato basta un quantificatore
+            # interno con un numero variabile di ripetizioni, come in
+            # ([a-z]{2,4})+, per avere più modi di dividere l'input
+            for inner in iter_tail_repeats(body, bounded=True):
+                if inner is repeat:
+                    continue
+
+                overlap = get_chars(inner[2]) & body_first
+                if overlap:
+                    problems.append(
+                        ("quantificatori annidati", prefix, overlap, True)
+                    )
+                    break
+
+            for body_op, body_av in body:
+                if body_op != constants.BRANCH:
+                    continue
+
+                firsts = [get_first(branch)[0] for branch in body_av[1]]
+                for i, first in enumerate(firsts):
+                    overlap = set().union(
+                        *(first & other for other in firsts[i + 1:])
+                    )
+                    if overlap:
+                        problems.append(
+                            ("alternative sovrapposte", prefix, overlap, True)
+                        )
+                        break
+
+            for next_op, next_av in items[index + 1:]:
+                next_repeat = get_repeat(next_op, next_av)
+                if next_repeat is not None:
+                    overlap = get_atom_chars(body) & get_atom_chars(
+                        next_repeat[2]
+                    )
+                    if overlap:
+                        problems.append(
+                            (
+                                "quantificatori adiacenti sovrapposti",
+                                prefix,
+                                overlap,
+                                False,
+                            )
+                        )
+                    break
+
+                if not get_item_first(next_op, next_av)[1]:
+                    break
+
+        for sub in get_subpatterns(op, av):
+            analyse_sequence(
+                sub, prefix + sample(items[:index]), problems
+            )
+
+
+def analyse(pattern, flags=0):
+    try:
+        seq = parser.parse(pattern, flags)
+    except Exception:
+        return []
+
+    problems = []
+    analyse_sequence(seq, "", problems)
+    return problems
+
+
+def fuzz(pattern, flags, problems, timeout):
+    attacks = []
+    for _, prefix, overlap, exponential in problems:
+        pump = pick(overlap)
+        length = 32 if exponential else 5000
+        for suffix in ("!", "\n", "\x00"):
+            attacks.append(prefix + pump * length + suffix)
+
+    try:
+        subprocess.run(
+            [sys.executable, "-c", FUZZ_SCRIPT],
+            input=json.dumps([pattern, flags, attacks]),
+            text=True,
+            timeout=timeout,
+            capture_output=True,
+        )
+    except subprocess.TimeoutExpired:
+        return True
+
+    return False
+
+
+def get_regex_validators(validators):
+    for validator in validators:
+        if isinstance(validator, RegexValidator):
+            yield validator.regex.pattern, validator.regex.flags
+
+
+def list_regexes(app_configs):
+    # (pattern, flag, descrizione, obj)
+    for app in utils.list_apps(app_configs):
+        for model in app.get_models():
+            for field in model._meta.get_fields():
+                for pattern, flags in get_regex_validators(
+                    getattr(field, "validators", ())
+                ):
+                    yield pattern, flags, f"Field '{field.name}'", model
+
+        for name, form in list_forms(app):
+            for field_name, field in form.declared_fields.items():
+                for pattern, flags in get_regex_validators(
+                    field.validators
+                ):
+                    yield pattern, flags, f"Field '{field_name}'", name
+
+    for chain in utils.iter_url_patterns():
+        pattern = chain[-1].pattern
+        if isinstance(pattern, RegexPattern):
+            route = "".join(str(p.pattern) for p in chain)
+            name = chain[-1].name
+            label = f"URL '{name}' ({route})" if name else f"URL {route}"
+            yield str(pattern), pattern.regex.flags, label, None
+
+
+@register(Tags.security, utils.PERFORMANCE_TAG)
+def check_redos(app_configs, **kwargs):
+    errors = []
+    budget = utils.get_setting("REDOS_FUZZ_TIME", 0)
+    timeout = utils.get_setting("REDOS_FUZZ_TIMEOUT", 1.0)
+    deadline = time.monotonic() + budget
+    for pattern, flags, label, obj in list_regexes(app_configs):
+        problems = analyse(pattern, flags)
+        if not problems:
+            continue
+
+        reasons = ", ".join(sorted({problem[0] for problem in problems}))
+        if time.monotonic() + timeout <= deadline and fuzz(
+            pattern, flags, problems, timeout
+        ):
+            errors.append(
+                Error(
+                    (
+                        f"{label}: la regex {pattern!r} impiega più di "
+                        f"{timeout}s su un input di prova ({reasons})"
+                    ),
+                    obj=obj,
+                    hint="Riscrivi la regex evitando il backtracking",
+                    id="simc_djangochecks.E099",
+                )
+            )
+        else:
+            errors.append(
+                Warning(
+                    (
+                        f"{label}: la regex {pattern!r} è soggetta a "
+                        f"backtracking catastrofico ({reasons})"
+                    ),
+                    obj=obj,
+                    hint="Riscrivi la regex evitando il backtracking",
+                    id="simc_djangochecks.W098",
+                )
+            )
+
+    return errors
@@ -0,0 +1,298 @@
+import ast
+import os
+from collections import defaultdict
+
+from django.core.checks import register, Tags, Error, Warning, Info
+
+from simc_djangochecks import utils
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+# Esempio:
+#
+# SIMC_DJANGOCHECKS_RULES = [
+#     {
+#         "id": "myproject.W001",
+#         "level": "warning",
+#         "call": "requests.*",
+#         "keyword": "verify",
+#         "value": False,
+#         "msg": "disabilita la verifica dei certificati",
+#     },
+# ]
+
+LEVELS = {"error": Error, "warning": Warning, "info": Info}
+
+KINDS = ("call", "keyword", "import", "decorator")
+
+
+def get_pattern_token(pattern):
+    name = pattern[:-2] if pattern.endswith(".*") else pattern
+    return name.split(".")[-1].encode()
+
+
+def match_keyword(rule, keywords):
+    for keyword in keywords:
+        if keyword.arg != rule["keyword"]:
+            continue
+
+        if "value" not in rule:
+            return keyword
+
+        value = keyword.value
+        if (
+            isinstance(value, ast.Constant)
+            and type(value.value) is type(rule["value"])
+            and value.value == rule["value"]
+        ):
+            return keyword
+
+    return None
+
+
+def compile_call(rule):
+    names = utils.QualifiedNames(rule["call"])
+
+    def match(node, context):
+        if context.symbols.resolve(node.func) not in names:
+            return None
+
+        if "keyword" in rule:
+            return match_keyword(rule, node.keywords)
+
+        return node
+
+    return (ast.Call,), match, get_pattern_token(rule["call"])
+
+
+def compile_keyword(rule):
+    def match(node, context):
+        return match_keyword(rule, [node])
+
+    return (ast.keyword,), match, rule["keyword"].encode()
+
+
+def compile_import(rule):
+    # "subprocess" e "subprocess.*" riconoscono sia il modulo
+    # (import subprocess) sia i suoi membri (from subprocess import run)
+    module = rule["import"].removesuffix(".*")
+
+    def match(node, context):
+        if any(
+            qualname == module or qualname.startswith(f"{module}.")
+            for qualname in context.imports[node]
+        ):
+            return node
+
+        return None
+
+    return (
+        (ast.Import, ast.ImportFrom),
+        match,
+        get_pattern_token(rule["import"]),
+    )
+
+
+def compile_decorator(rule):
+    names = utils.QualifiedNames(rule["decorator"])
+
+    def match(node, context):
+        for decorator in node.decorator_list:
+            if isinstance(decorator, ast.Call):
+                decorator = decorator.func
+
+            if context.symbols.resolve(decorator) in names:
+                return decorator
+
+        return None
+
+    return (
+        (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef),
+        match,
+        get_pattern_token(rule["decorator"]),
+    )
+
+
+COMPILERS = {
+    "call": compile_call,
+    "keyword": compile_keyword,
+    "import": compile_import,
+    "decorator": compile_decorator,
+}
+
+
+def validate_rule(rule):
+    if not isinstance(rule, dict):
+        return "la regola deve essere un dizionario"
+
+    for key in ("id", "msg"):
+        if not isinstance(rule.get(key), str):
+            return f"manca la chiave {key}"
+
+    level = rule.get("level", "error")
+    if not isinstance(level, str) or level not in LEVELS:
+        return f"livello {level!r} non valido"
+
+    if not isinstance(rule.get("hint", ""), str):
+        return "hint deve essere una stringa"
+
+    kinds = [kind for kind in KINDS if kind in rule]
+    for kind in kinds:
+        if not isinstance(rule[kind], str) or not rule[kind]:
+            return f"{kind} deve essere una stringa non vuota"
+
+    # keyword può essere anche una condizione di call
+    if "call" in rule and "keyword" in rule:
+        kinds.remove("keyword")
+
+    if len(kinds) != 1:
+        return f"serve esattamente uno tra {', '.join(KINDS)}"
+
+    if "value" in rule and "keyword" not in rule:
+        return "value richiede keyword"
+
+    return None
+
+
+class RuleSet:
+    def __init__(self, rules, errors=()):
+        # tipo di nodo -> [(regola, funzione di match)]
+        self.table = defaultdict(list)
+        # Errori di caricamento delle regole
+        self.errors = list(errors)
+        self.invalid = []
+        tokens = set()
+        for index, rule in enumerate(rules):
+            error = validate_rule(rule)
+            if error is not None:
+                self.invalid.append((index, error))
+                continue
+
+            kind = next(kind for kind in KINDS if kind in rule)
+            node_types, match, token = COMPILERS[kind](rule)
+            for node_type in node_types:
+                self.table[node_type].append((rule, match))
+
+            tokens.add(token)
+
+        self.tokens = utils.register_tokens(*tokens)
+
+    def scan(self, module, symbols):
+        context = RuleContext(symbols)
+        for node in ast.walk(module):
+            for rule, match in self.table.get(type(node), ()):
+                matched = match(node, context)
+                if matched is not None:
+                    yield rule, matched
+
+
+class RuleContext:
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self.imports = defaultdict(list)
+        for node, qualname in symbols.imports:
+            self.imports[node].append(qualname)
+
+
+def load_rules():
+    # Restituisce le regole e gli errori di caricamento, riportati da
+    # check_rules_config invece di interrompere i check
+    rules = utils.get_setting("RULES", [])
+    errors = []
+    if not isinstance(rules, (list, tuple)):
+        errors.append("SIMC_DJANGOCHECKS_RULES deve essere una lista")
+        rules = []
+
+    rules = list(rules)
+    path = utils.get_setting("RULES_FILE")
+    if path is None:
+        return rules, errors
+
+    if yaml is None:
+        errors.append("PyYAML è necessario per SIMC_DJANGOCHECKS_RULES_FILE")
+        return rules, errors
+
+    try:
+        with open(path) as fp:
+            file_rules = yaml.safe_load(fp) or []
+    except (OSError, yaml.YAMLError) as e:
+        errors.append(f"SIMC_DJANGOCHECKS_RULES_FILE non leggibile: {e}")
+        return rules, errors
+
+    if not isinstance(file_rules, list):
+        errors.append(f"{path} deve contenere una lista di regole")
+        return rules, errors
+
+    return rules + file_rules, errors
+
+
+def get_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+ruleset_cache = {}
+
+
+def get_ruleset():
+    path = utils.get_setting("RULES_FILE")
+    key = (
+        repr(utils.get_setting("RULES", [])),
+        path,
+        get_mtime(path) if path is not None else None,
+    )
+    if key not in ruleset_cache:
+        ruleset_cache.clear()
+        ruleset_cache[key] = RuleSet(*load_rules())
+
+    return ruleset_cache[key]
+
+
+@register(Tags.security)
+def check_rules_config(app_configs, **kwargs):
+    ruleset = get_ruleset()
+    return [
+        Error(error, id="simc_djangochecks.E091") for error in ruleset.errors
+    ] + [
+        Error(
+            f"Regola {index} di SIMC_DJANGOCHECKS_RULES non valida: {error}",
+            id="simc_djangochecks.E091",
+        )
+        for index, error in ruleset.invalid
+    ]
+
+
+@register(Tags.security)
+@utils.app_scoped
+def check_rules(app_configs, **kwargs):
+    ruleset = get_ruleset()
+    findings = []
+    if not ruleset.table:
+        return findings
+
+    for app in utils.list_apps(app_configs):
+        for path in utils.iter_app_files(app, "*.py", ruleset.tokens):
+            module = utils.parse_file(path)
+            symbols = utils.get_symbols(module, path)
+            for rule, node in ruleset.scan(module, symbols):
+                findings.append(
+                    utils.locate_node(
+                        utils.Finding(
+                            LEVELS[rule.get("level", "error")],
+                            "{} {}",
+                            app.name,
+                            rule["msg"],
+                            hint=rule.get("hint"),
+                            id=rule["id"],
+                        ),
+                        path, module, node,
+                    )
+                )
+
+    return utils.to_messages(findings)
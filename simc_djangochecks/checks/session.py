@@ -1,8 +1,17 @@
+import bisect
+import os
 import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from importlib import import_module
 from pathlib import Path
 
-from django.core.checks import register, Tags, Warning, Error
+from django.core.checks import register, Tags, Info, Warning, Error
 from django.conf import settings
+from django.db import router
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from simc_djangochecks import utils
 
 
 @register(Tags.security)
@@ -171,3 +180,160 @@ def check_session_cookie_attributes(**kwargs):
         )
 
     return errors
+
+
+SESSION_SIZE_BUCKETS = (1024, 4 * 1024, 16 * 1024, 64 * 1024)
+
+
+class SessionStats:
+    # Statistiche calcolate in streaming: la memoria usata non dipende dal
+    # numero di sessioni
+    def __init__(self, now, max_size):
+        self.now = now
+        self.max_size = max_size
+        self.count = 0
+        self.expired = 0
+        self.oversized = 0
+        self.total_size = 0
+        self.largest = 0
+        self.oldest_expiry = None
+        self.buckets = [0] * (len(SESSION_SIZE_BUCKETS) + 1)
+
+    def add(self, size, expire_date):
+        self.count += 1
+        self.total_size += size
+        self.largest = max(self.largest, size)
+        self.buckets[bisect.bisect_right(SESSION_SIZE_BUCKETS, size)] += 1
+        if size > self.max_size:
+            self.oversized += 1
+
+        if expire_date < self.now:
+            self.expired += 1
+            if self.oldest_expiry is None or expire_date < self.oldest_expiry:
+                self.oldest_expiry = expire_date
+
+    def format_buckets(self):
+        labels = [f"< {utils.format_size(SESSION_SIZE_BUCKETS[0])}"]
+        labels += [
+            f"{utils.format_size(low)}-{utils.format_size(high)}"
+            for low, high in zip(
+                SESSION_SIZE_BUCKETS, SESSION_SIZE_BUCKETS[1:]
+            )
+        ]
+        labels.append(f">= {utils.format_size(SESSION_SIZE_BUCKETS[-1])}")
+        return ", ".join(
+            f"{label}: {count}" for label, count in zip(labels, self.buckets)
+        )
+
+
+def scan_session_table(model, database, stats):
+    chunk_size = utils.get_setting("SESSION_CHUNK_SIZE", 2000)
+    # La dimensione viene calcolata dal database: session_data non viene
+    # trasferito
+    rows = (
+        model.objects.using(database)
+        .annotate(size=Length("session_data"))
+        .values_list("size", "expire_date")
+        .iterator(chunk_size=chunk_size)
+    )
+    for size, expire_date in rows:
+        stats.add(size or 0, expire_date)
+
+
+def scan_session_files(path, stats):
+    prefix = settings.SESSION_COOKIE_NAME
+    max_age = timedelta(seconds=settings.SESSION_COOKIE_AGE)
+    try:
+        entries = os.scandir(path)
+    except FileNotFoundError:
+        # Directory non ancora creata: nessuna sessione
+        return
+
+    with entries:
+        for entry in entries:
+            if not entry.name.startswith(prefix) or not entry.is_file():
+                continue
+
+            stat = entry.stat()
+            if settings.USE_TZ:
+                modified = datetime.fromtimestamp(
+                    stat.st_mtime, dt_timezone.utc
+                )
+            else:
+                modified = datetime.fromtimestamp(stat.st_mtime)
+
+            stats.add(stat.st_size, modified + max_age)
+
+
+@register(Tags.database, utils.PERFORMANCE_TAG, deploy=True)
+def check_session_storage(app_configs, databases=None, **kwargs):
+    errors = []
+    engine = import_module(settings.SESSION_ENGINE)
+    stats = SessionStats(
+        timezone.now(),
+        utils.get_setting("SESSION_MAX_SIZE", 4 * 1024),
+    )
+    if hasattr(engine.SessionStore, "get_model_class"):
+        model = engine.SessionStore.get_model_class()
+        database = router.db_for_read(model)
+        # Come i check di Django con Tags.database, solo con --database
+        if not databases or database not in databases:
+            return errors
+
+        scan_session_table(model, database, stats)
+        where = f"tabella {model._meta.db_table}"
+    elif settings.SESSION_ENGINE == "django.contrib.sessions.backends.file":
+        path = settings.SESSION_FILE_PATH or tempfile.gettempdir()
+        scan_session_files(path, stats)
+        where = f"directory {path}"
+    else:
+        return errors
+
+    if not stats.count:
+        return errors
+
+    errors.append(
+        Info(
+            (
+                f"{stats.count} sessioni nella {where} ({stats.expired} "
+                f"scadute), {utils.format_size(stats.total_size)} in totale, "
+                f"la più grande di {utils.format_size(stats.largest)} "
+                f"({stats.format_buckets()})"
+            ),
+            id="simc_djangochecks.I104",
+        )
+    )
+
+    if stats.oversized:
+        errors.append(
+            Warning(
+                (
+                    f"{stats.oversized} sessioni più grandi di "
+                    f"{utils.format_size(stats.max_size)}: vengono lette e "
+                    "deserializzate ad ogni richiesta"
+                ),
+                hint="Salva in sessione solo identificativi, non oggetti",
+                id="simc_djangochecks.W105",
+            )
+        )
+
+    max_expired_age = timedelta(
+        days=utils.get_setting("SESSION_MAX_EXPIRED_DAYS", 7)
+    )
+    if (
+        stats.oldest_expiry is not None
+        and stats.now - stats.oldest_expiry > max_expired_age
+    ):
+        days = (stats.now - stats.oldest_expiry).days
+        errors.append(
+            Warning(
+                (
+                    f"{stats.expired} sessioni scadute, la più vecchia da "
+                    f"{days} giorni: clearsessions non viene eseguito"
+                ),
+                hint="Esegui periodicamente manage.py clearsessions",
+                id="simc_djangochecks.W106",
+            )
+        )
+
+    return errors
@@ -0,0 +1,146 @@
+import heapq
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import HashedFilesMixin
+from django.core.checks import register, Tags, Info, Warning
+from django.utils.module_loading import import_string
+
+from simc_djangochecks import utils
+
+
+COMPRESSIBLE_EXTENSIONS = (
+    ".css",
+    ".js",
+    ".mjs",
+    ".map",
+    ".json",
+    ".svg",
+    ".html",
+    ".txt",
+    ".xml",
+    ".ttf",
+    ".otf",
+    ".eot",
+)
+
+COMPRESSED_EXTENSIONS = (".gz", ".br")
+
+
+def get_staticfiles_storage():
+    storages = getattr(settings, "STORAGES", {})
+    if "staticfiles" in storages:
+        return storages["staticfiles"]["BACKEND"]
+
+    return getattr(
+        settings,
+        "STATICFILES_STORAGE",
+        "django.contrib.staticfiles.storage.StaticFilesStorage",
+    )
+
+
+def walk_files(root):
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry.path, entry.stat().st_size
+
+
+@register(Tags.staticfiles, utils.PERFORMANCE_TAG, deploy=True)
+def check_staticfiles_storage(app_configs, **kwargs):
+    errors = []
+    storage = get_staticfiles_storage()
+    try:
+        storage_cls = import_string(storage)
+    except ImportError:
+        return errors
+
+    if not issubclass(storage_cls, HashedFilesMixin):
+        errors.append(
+            Warning(
+                f"Storage dei file statici senza hash nel nome: {storage}",
+                hint=(
+                    "Usa ManifestStaticFilesStorage (o una sua sottoclasse) "
+                    "per poter servire i file statici con cache di lunga "
+                    "durata"
+                ),
+                id="simc_djangochecks.W084",
+            )
+        )
+
+    return errors
+
+
+@register(Tags.staticfiles, utils.PERFORMANCE_TAG, deploy=True)
+def check_staticfiles_payload(app_configs, **kwargs):
+    errors = []
+    static_root = settings.STATIC_ROOT
+    if not static_root or not os.path.isdir(static_root):
+        return errors
+
+    files = {}
+    totals = defaultdict(lambda: [0, 0])
+    for path, size in walk_files(static_root):
+        files[path] = size
+        extension = os.path.splitext(path)[1].lower() or "(nessuna)"
+        totals[extension][0] += 1
+        totals[extension][1] += size
+
+    uncompressed = [
+        (size, path)
+        for path, size in files.items()
+        if path.lower().endswith(COMPRESSIBLE_EXTENSIONS)
+        and not any(f"{path}{ext}" in files for ext in COMPRESSED_EXTENSIONS)
+    ]
+
+    errors.append(
+        Info(
+            "Payload dei file statici per tipo: " + ", ".join(
+                f"{extension} {utils.format_size(size)} ({count} file)"
+                for extension, (count, size) in sorted(
+                    totals.items(), key=lambda item: -item[1][1]
+                )
+            ),
+            id="simc_djangochecks.I085",
+        )
+    )
+
+    if uncompressed:
+        total = sum(size for size, _ in uncompressed)
+        errors.append(
+            Warning(
+                (
+                    f"{len(uncompressed)} file statici comprimibili senza "
+                    "versione precompressa .gz/.br "
+                    f"({utils.format_size(total)})"
+                ),
+                hint=(
+                    "Usa uno storage che comprime i file durante "
+                    "collectstatic, ad esempio "
+                    "whitenoise.storage.CompressedManifestStaticFilesStorage"
+                ),
+                id="simc_djangochecks.W086",
+            )
+        )
+
+    max_size = utils.get_setting("STATIC_MAX_SIZE", 512 * 1024)
+    report_size = utils.get_setting("STATIC_REPORT_SIZE", 10)
+    for size, path in heapq.nlargest(report_size, uncompressed):
+        if size > max_size:
+            errors.append(
+                Warning(
+                    (
+                        "File statico non compresso di "
+                        f"{utils.format_size(size)}: "
+                        f"{os.path.relpath(path, static_root)}"
+                    ),
+                    id="simc_djangochecks.W087",
+                )
+            )
+
+    return errors
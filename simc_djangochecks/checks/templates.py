@@ -1,9 +1,14 @@
+import hashlib
+import json
 import os
-from pathlib import Path
 import re
+import time
+from pathlib import Path
 
+from django.apps import apps
 from django.conf import settings
-from django.core.checks import register, Tags, Error, Warning
+from django.core.checks import register, Tags, Error, Info, Warning
+from django.template import engines
 
 from simc_djangochecks import utils
 
@@ -19,38 +24,52 @@ def list_template_dirs(app_configs):
     return dirs
 
 
+SAFE_TAG_TOKENS = utils.register_tokens(b"autoescape", b"safe")
+
+
+def get_line(content, index):
+    start = content.rfind("\n", 0, index) + 1
+    end = content.find("\n", index)
+    return content[start:end if end != -1 else len(content)]
+
+
 @register(Tags.security)
+@utils.source_scoped
 def check_safe_tag(app_configs, **kwargs):
-    errors = []
+    findings = []
     for template_dir in list_template_dirs(utils.list_apps(app_configs)):
-        for path in Path(template_dir).rglob("*.htm*"):
+        for path in utils.iter_files(
+            template_dir, "*.htm*", tokens=SAFE_TAG_TOKENS
+        ):
             with path.open() as fp:
                 content = fp.read()
-                if re.search(r"\{%\s*autoescape\s+on", content):
-                    errors.append(
-                        Error(
-                            f"Uso di 'autoscape on' nel template {path}",
-                            id="simc_djangochecks.E015",
+                for regex, msg, id in (
+                    (
+                        r"\{%\s*autoescape\s+on",
+                        "Uso di 'autoscape on' nel template {}",
+                        "simc_djangochecks.E015",
+                    ),
+                    (
+                        r"[|]\s*safe",
+                        "Uso del 'safe' filter nel template {}",
+                        "simc_djangochecks.E016",
+                    ),
+                    (
+                        r"[|]\s*safeseq",
+                        "Uso di 'safeseq' filter in template {}",
+                        "simc_djangochecks.E017",
+                    ),
+                ):
+                    match = re.search(regex, content)
+                    if match:
+                        findings.append(
+                            utils.locate_text(
+                                utils.Finding(Error, msg, path, id=id),
+                                path, get_line(content, match.start()),
+                            )
                         )
-                    )
 
-                if re.search(r"[|]\s*safe", content):
-                    errors.append(
-                        Error(
-                            f"Uso del 'safe' filter nel template {path}",
-                            id="simc_djangochecks.E016",
-                        )
-                    )
-
-                if re.search(r"[|]\s*safeseq", content):
-                    errors.append(
-                        Error(
-                            f"Uso di 'safeseq' filter in template {path}",
-                            id="simc_djangochecks.E017",
-                        )
-                    )
-
-    return errors
+    return utils.to_messages(findings)
 
 
 @register(Tags.security)
@@ -79,4 +98,323 @@ def check_template_backend(app_configs, **kwargs):
         except KeyError:
             pass
 
+        if not settings.DEBUG and backend == default_template:
+            errors += check_template_performance(template)
+
+    if not settings.DEBUG:
+        errors += check_include_in_loop(app_configs)
+
+    return errors
+
+
+CACHED_LOADER = "django.template.loaders.cached.Loader"
+APP_DIRECTORIES_LOADER = "django.template.loaders.app_directories.Loader"
+
+
+def get_loader_names(loaders):
+    names = []
+    for loader in loaders:
+        if isinstance(loader, (tuple, list)):
+            names.append(loader[0])
+            names += get_loader_names(loader[1])
+        else:
+            names.append(loader)
+
+    return names
+
+
+def list_app_template_dirs():
+    return [
+        path
+        for path in (
+            os.path.join(app.path, "templates")
+            for app in apps.get_app_configs()
+        )
+        if os.path.isdir(path)
+    ]
+
+
+def check_template_performance(template):
+    errors = []
+    options = template.get("OPTIONS", {})
+    app_dirs = template.get("APP_DIRS", False)
+    loaders = get_loader_names(options.get("loaders", []))
+    if app_dirs or APP_DIRECTORIES_LOADER in loaders:
+        app_template_dirs = list_app_template_dirs()
+    else:
+        app_template_dirs = []
+
+    template_dirs = len(template.get("DIRS", [])) + len(app_template_dirs)
+
+    # Senza "loaders" espliciti Django usa già il cached loader
+    if "loaders" in options and CACHED_LOADER not in loaders:
+        errors.append(
+            Warning(
+                f"TEMPLATES senza {CACHED_LOADER} con DEBUG = False",
+                hint=(
+                    "Costo stimato per render: lettura e compilazione di "
+                    "ogni template usato, con ricerca in fino a "
+                    f"{template_dirs} directory per template"
+                ),
+                id="simc_djangochecks.W075",
+            )
+        )
+
+    if options.get("debug", False):
+        errors.append(
+            Warning(
+                "TEMPLATES con OPTIONS['debug'] = True e DEBUG = False",
+                hint=(
+                    "Costo stimato per render: informazioni di debug "
+                    "(sorgente e posizione) per ogni nodo e token dei "
+                    "template"
+                ),
+                id="simc_djangochecks.W076",
+            )
+        )
+
+    max_app_dirs = utils.get_setting("TEMPLATE_MAX_APP_DIRS", 100)
+    if app_dirs and len(app_template_dirs) > max_app_dirs:
+        errors.append(
+            Warning(
+                (
+                    f"TEMPLATES con APP_DIRS e {len(app_template_dirs)} "
+                    "app con directory templates"
+                ),
+                hint=(
+                    "Costo stimato per render: fino a "
+                    f"{template_dirs} lookup su filesystem per ogni "
+                    "template non ancora in cache. Usa DIRS espliciti"
+                ),
+                id="simc_djangochecks.W077",
+            )
+        )
+
+    return errors
+
+
+INCLUDE_TOKENS = utils.register_tokens(b"include")
+TEMPLATE_TAG_REGEX = re.compile(r"\{%\s*(\w+)")
+
+
+def check_include_in_loop(app_configs):
+    findings = []
+    for template_dir in list_template_dirs(utils.list_apps(app_configs)):
+        for path in utils.iter_files(
+            template_dir, "*.htm*", tokens=INCLUDE_TOKENS
+        ):
+            with path.open() as fp:
+                content = fp.read()
+                depth = 0
+                for match in TEMPLATE_TAG_REGEX.finditer(content):
+                    tag = match.group(1)
+                    if tag == "for":
+                        depth += 1
+                    elif tag == "endfor":
+                        depth = max(depth - 1, 0)
+                    elif tag == "include" and depth > 0:
+                        findings.append(
+                            utils.locate_text(
+                                utils.Finding(
+                                    Warning,
+                                    "{}:{} usa include in un ciclo for",
+                                    path,
+                                    content.count("\n", 0, match.start()) + 1,
+                                    hint=(
+                                        "Costo stimato per render: un render "
+                                        "del template incluso, con un nuovo "
+                                        "contesto, per ogni iterazione. "
+                                        "Sposta il contenuto nel template o "
+                                        "usa un inclusion tag"
+                                    ),
+                                    id="simc_djangochecks.W078",
+                                ),
+                                path, get_line(content, match.start()),
+                            )
+                        )
+
+    return utils.to_messages(findings)
+
+
+def measure(func, number):
+    best = None
+    for _ in range(number):
+        start = time.perf_counter()
+        result = func()
+        duration = time.perf_counter() - start
+        if best is None or duration < best:
+            best = duration
+
+    return result, best
+
+
+def list_templates(backend, template_dirs):
+    template_dirs = {Path(d).resolve() for d in template_dirs}
+    seen = set()
+    for template_dir in backend.template_dirs:
+        project = Path(template_dir).resolve() in template_dirs
+        # Non diviso in shard: la baseline deve coprire tutti i template
+        for path in Path(template_dir).rglob("*"):
+            name = path.relative_to(template_dir).as_posix()
+            # Come per i loader, vale il primo template con lo stesso nome
+            if name in seen or not path.is_file():
+                continue
+
+            seen.add(name)
+            if project:
+                yield name, path
+
+
+def get_baseline_path():
+    path = utils.get_setting("TEMPLATE_BENCHMARK_BASELINE", None)
+    if path is not None:
+        return Path(path)
+
+    base_dir = str(getattr(settings, "BASE_DIR", None) or os.getcwd())
+    project = hashlib.sha1(base_dir.encode()).hexdigest()[:12]
+    return Path(utils.get_cache_dir()) / f"templates-{project}.json"
+
+
+def load_baseline(path):
+    try:
+        with open(path) as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return None
+
+
+def get_growth(current, previous, minimum=0):
+    # Sotto la soglia le differenze sono dominate dal rumore della misura
+    if not previous or current < minimum:
+        return 0
+
+    return current / previous - 1
+
+
+@register(Tags.templates, utils.PERFORMANCE_TAG, deploy=True)
+def check_template_render(app_configs, **kwargs):
+    errors = []
+    if not utils.get_setting("TEMPLATE_BENCHMARK", False):
+        return errors
+
+    # Con lo sharding il benchmark viene eseguito solo dal primo shard
+    shard = utils.get_shard()
+    if shard is not None and shard[0] != 1:
+        return errors
+
+    number = utils.get_setting("TEMPLATE_BENCHMARK_NUMBER", 5)
+    contexts = utils.get_setting("TEMPLATE_BENCHMARK_CONTEXTS", {})
+    max_growth = utils.get_setting("TEMPLATE_BENCHMARK_MAX_GROWTH", 0.2)
+    min_render = utils.get_setting("TEMPLATE_BENCHMARK_MIN_RENDER", 0.001)
+
+    template_dirs = list_template_dirs(utils.list_apps(app_configs))
+    results = {}
+    for backend in engines.all():
+        for name, path in list_templates(backend, template_dirs):
+            try:
+                source = path.read_text()
+            except (OSError, UnicodeDecodeError):
+                continue
+
+            try:
+                template, compile_time = measure(
+                    lambda: backend.from_string(source), number
+                )
+            except Exception as e:
+                errors.append(
+                    Error(
+                        f"Compilazione del template {path} fallita: {e}",
+                        id="simc_djangochecks.E114",
+                    )
+                )
+                continue
+
+            context = contexts.get(name, {})
+            try:
+                output, render_time = measure(
+                    lambda: template.render(context), number
+                )
+            except Exception as e:
+                errors.append(
+                    Warning(
+                        f"Render del template {path} fallito: {e!r}",
+                        hint=(
+                            "Definisci un contesto per il template in "
+                            "SIMC_DJANGOCHECKS_TEMPLATE_BENCHMARK_CONTEXTS"
+                        ),
+                        id="simc_djangochecks.W115",
+                    )
+                )
+                continue
+
+            results[f"{backend.name}:{name}"] = {
+                "path": str(path),
+                "compile": compile_time,
+                "render": render_time,
+                "size": len(output.encode()),
+            }
+
+    baseline_path = get_baseline_path()
+    baseline = load_baseline(baseline_path)
+    if baseline is None:
+        # La prima esecuzione crea la baseline per i confronti successivi
+        utils.save_json(baseline_path, results, indent=2, sort_keys=True)
+        baseline = {}
+
+    growths = {}
+    for key, result in results.items():
+        previous = baseline.get(key, {})
+        growths[key] = max(
+            get_growth(
+                result["render"], previous.get("render"), min_render
+            ),
+            get_growth(result["size"], previous.get("size")),
+        )
+
+    ranked = sorted(
+        results,
+        key=lambda key: (
+            growths[key] <= max_growth,
+            -growths[key],
+            -results[key]["render"],
+        ),
+    )
+    # I messaggi vengono riportati in ordine alfabetico: la posizione nella
+    # classifica è all'inizio del messaggio, con le cifre allineate
+    width = len(str(len(ranked)))
+    for rank, key in enumerate(ranked, 1):
+        result = results[key]
+        previous = baseline.get(key, {})
+        # I valori misurati sono nell'hint, nel messaggio solo la posizione
+        detail = (
+            f"Compilazione {result['compile'] * 1000:.2f} ms, render "
+            f"{result['render'] * 1000:.2f} ms, "
+            f"{utils.format_size(result['size'])}"
+        )
+        if growths[key] > max_growth:
+            errors.append(
+                Warning(
+                    (
+                        f"#{rank:0{width}} Template {result['path']} in "
+                        f"crescita oltre il {max_growth:.0%} rispetto alla "
+                        "baseline"
+                    ),
+                    hint=(
+                        f"{detail} (+{growths[key]:.0%}). Baseline: render "
+                        f"{previous['render'] * 1000:.2f} ms, "
+                        f"{utils.format_size(previous['size'])} "
+                        f"({baseline_path})"
+                    ),
+                    id="simc_djangochecks.W116",
+                )
+            )
+        else:
+            errors.append(
+                Info(
+                    f"#{rank:0{width}} Template {result['path']}",
+                    hint=detail,
+                    id="simc_djangochecks.I117",
+                )
+            )
+
     return errors
@@ -0,0 +1,321 @@
+import ast
+import operator
+import os
+
+from django.conf import settings
+from django.core.checks import register, Info, Warning
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.utils.module_loading import import_string
+
+from simc_djangochecks import utils
+
+
+GUNICORN_DEFAULTS = {"workers": 1, "threads": 1}
+
+OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.FloorDiv: operator.floordiv,
+}
+
+
+def evaluate(node):
+    # Valuta le espressioni tipiche delle configurazioni di gunicorn, ad
+    # esempio multiprocessing.cpu_count() * 2 + 1, senza eseguire il file
+    if isinstance(node, ast.Constant) and isinstance(node.value, int):
+        return node.value
+
+    if isinstance(node, ast.BinOp) and type(node.op) in OPERATORS:
+        left = evaluate(node.left)
+        right = evaluate(node.right)
+        if left is not None and right is not None:
+            return OPERATORS[type(node.op)](left, right)
+
+    if isinstance(node, ast.Call) and not node.args:
+        func = node.func
+        if (
+            isinstance(func, ast.Attribute) and func.attr == "cpu_count"
+        ) or (isinstance(func, ast.Name) and func.id == "cpu_count"):
+            return os.cpu_count()
+
+    return None
+
+
+def read_gunicorn_config(path):
+    # nome -> espressione, valutata da get_concurrency
+    config = {}
+    for node in utils.parse_file(path).body:
+        if isinstance(node, ast.Assign):
+            for target in node.targets:
+                if (
+                    isinstance(target, ast.Name)
+                    and target.id in GUNICORN_DEFAULTS
+                ):
+                    config[target.id] = node.value
+
+    return config
+
+
+def get_concurrency():
+    # Restituisce (worker, thread) o None, e gli errori di lettura della
+    # configurazione di gunicorn
+    errors = []
+    workers = utils.get_setting("WORKERS")
+    threads = utils.get_setting("THREADS")
+    path = utils.get_setting("GUNICORN_CONFIG")
+    if path is not None and (workers is None or threads is None):
+        try:
+            config = read_gunicorn_config(path)
+        except (OSError, SyntaxError, ValueError) as e:
+            errors.append(
+                Warning(
+                    f"SIMC_DJANGOCHECKS_GUNICORN_CONFIG non leggibile: {e}",
+                    id="simc_djangochecks.W118",
+                )
+            )
+            return None, errors
+
+        # Default di gunicorn quando workers non è impostato
+        defaults = dict(GUNICORN_DEFAULTS)
+        concurrency = os.environ.get("WEB_CONCURRENCY")
+        if (
+            concurrency is not None
+            and workers is None
+            and "workers" not in config
+        ):
+            try:
+                defaults["workers"] = int(concurrency)
+            except ValueError:
+                errors.append(
+                    Warning(
+                        f"WEB_CONCURRENCY={concurrency!r} non è un intero",
+                        hint=(
+                            "Imposta SIMC_DJANGOCHECKS_WORKERS e "
+                            "SIMC_DJANGOCHECKS_THREADS"
+                        ),
+                        id="simc_djangochecks.W119",
+                    )
+                )
+                defaults["workers"] = None
+
+        values = {}
+        for name, default in defaults.items():
+            if name not in config:
+                values[name] = default
+                continue
+
+            values[name] = evaluate(config[name])
+            if values[name] is None:
+                errors.append(
+                    Warning(
+                        (
+                            f"{path}:{config[name].lineno} valore di {name} "
+                            "non valutabile"
+                        ),
+                        hint=(
+                            "Imposta SIMC_DJANGOCHECKS_WORKERS e "
+                            "SIMC_DJANGOCHECKS_THREADS"
+                        ),
+                        id="simc_djangochecks.W119",
+                    )
+                )
+
+        if workers is None:
+            workers = values["workers"]
+
+        if threads is None:
+            threads = values["threads"]
+
+        # Un valore sconosciuto non deve sottostimare la memoria
+        if workers is None or threads is None:
+            return None, errors
+
+    if workers is None:
+        return None, errors
+
+    return (workers, threads or 1), errors
+
+
+def load_upload_handlers():
+    handlers = []
+    for name in settings.FILE_UPLOAD_HANDLERS:
+        try:
+            handlers.append(import_string(name))
+        except ImportError:
+            pass
+
+    return handlers
+
+
+@register(utils.PERFORMANCE_TAG)
+def check_upload_memory(app_configs, **kwargs):
+    errors = []
+
+    handlers = load_upload_handlers()
+    # Con handler non importabili non si può sapere come vengono scritti i
+    # file grandi
+    if len(handlers) == len(settings.FILE_UPLOAD_HANDLERS) and not any(
+        isinstance(handler, type)
+        and issubclass(handler, TemporaryFileUploadHandler)
+        for handler in handlers
+    ):
+        errors.append(
+            Warning(
+                "FILE_UPLOAD_HANDLERS non scrive su disco i file più grandi "
+                "di FILE_UPLOAD_MAX_MEMORY_SIZE",
+                hint=(
+                    "Aggiungi django.core.files.uploadhandler."
+                    "TemporaryFileUploadHandler"
+                ),
+                id="simc_djangochecks.W094",
+            )
+        )
+
+    concurrency, config_errors = get_concurrency()
+    errors += config_errors
+    if concurrency is None or settings.DATA_UPLOAD_MAX_MEMORY_SIZE is None:
+        return errors
+
+    workers, threads = concurrency
+    request_size = (
+        settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        + settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+    )
+    bound = workers * threads * request_size
+    detail = (
+        f"{workers} worker x {threads} thread x "
+        f"{utils.format_size(request_size)} "
+        "(FILE_UPLOAD_MAX_MEMORY_SIZE + DATA_UPLOAD_MAX_MEMORY_SIZE) = "
+        f"{utils.format_size(bound)}"
+    )
+    budget = utils.get_setting("UPLOAD_MEMORY_BUDGET")
+    if budget is None:
+        errors.append(
+            Info(
+                f"Memoria massima per gli upload: {detail}",
+                hint="Imposta SIMC_DJANGOCHECKS_UPLOAD_MEMORY_BUDGET",
+                id="simc_djangochecks.I095",
+            )
+        )
+    elif bound > budget:
+        errors.append(
+            Warning(
+                (
+                    f"Memoria massima per gli upload oltre il budget di "
+                    f"{utils.format_size(budget)}: {detail}"
+                ),
+                hint=(
+                    "Riduci FILE_UPLOAD_MAX_MEMORY_SIZE, "
+                    "DATA_UPLOAD_MAX_MEMORY_SIZE o il numero di worker"
+                ),
+                id="simc_djangochecks.W096",
+            )
+        )
+
+    return errors
+
+
+def is_uploaded_files(node):
+    # request.FILES o self.request.FILES
+    return isinstance(node, ast.Attribute) and node.attr == "FILES"
+
+
+def is_uploaded_file(node):
+    # request.FILES["name"], request.FILES.get("name")
+    if isinstance(node, ast.Subscript):
+        return is_uploaded_files(node.value)
+
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and node.func.attr == "get"
+        and is_uploaded_files(node.func.value)
+    )
+
+
+def is_uploaded_file_list(node):
+    # request.FILES.getlist("name"), request.FILES.values()
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and node.func.attr in ("getlist", "values")
+        and is_uploaded_files(node.func.value)
+    )
+
+
+class UploadReadVisitor(ast.NodeVisitor):
+    tokens = utils.register_tokens(b"FILES")
+
+    def __init__(self):
+        self.nodes = []
+        self.files = set()
+
+    def visit_FunctionDef(self, node):
+        files = self.files
+        self.files = set()
+        self.generic_visit(node)
+        self.files = files
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def bind(self, target, is_file):
+        if isinstance(target, ast.Name):
+            if is_file:
+                self.files.add(target.id)
+            else:
+                self.files.discard(target.id)
+
+    def visit_Assign(self, node):
+        for target in node.targets:
+            self.bind(target, is_uploaded_file(node.value))
+
+        self.generic_visit(node)
+
+    def visit_For(self, node):
+        self.bind(node.target, is_uploaded_file_list(node.iter))
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        if (
+            isinstance(node.func, ast.Attribute)
+            and node.func.attr == "read"
+            and not node.args
+            and not node.keywords
+        ):
+            value = node.func.value
+            if is_uploaded_file(value) or (
+                isinstance(value, ast.Name) and value.id in self.files
+            ):
+                self.nodes.append(node)
+
+        self.generic_visit(node)
+
+
+@register(utils.PERFORMANCE_TAG)
+@utils.app_scoped
+def check_upload_read(app_configs, **kwargs):
+    findings = []
+    for app in utils.list_apps(app_configs):
+        for path in utils.iter_app_files(
+            app, "*.py", UploadReadVisitor.tokens
+        ):
+            module = utils.parse_file(path)
+            visitor = UploadReadVisitor()
+            visitor.visit(module)
+            for node in visitor.nodes:
+                findings.append(
+                    utils.locate_node(
+                        utils.Finding(
+                            Warning,
+                            "{}:{} legge in memoria l'intero file caricato",
+                            path,
+                            node.lineno,
+                            hint="Usa chunks() per elaborare il file a pezzi",
+                            id="simc_djangochecks.W097",
+                        ),
+                        path, module, node,
+                    )
+                )
+
+    return utils.to_messages(findings)
@@ -0,0 +1,191 @@
+import heapq
+import timeit
+
+from django.conf import settings
+from django.core.checks import register, Tags, Info, Warning
+from django.urls import Resolver404, get_resolver
+from django.urls.resolvers import RegexPattern, RoutePattern
+
+from simc_djangochecks import utils
+from simc_djangochecks.checks.redos import sample_regex
+
+
+def get_route(chain):
+    # Come ResolverMatch.route: il "^" dei pattern annidati viene rimosso
+    route = ""
+    for pattern in chain:
+        part = str(pattern.pattern)
+        route += part.removeprefix("^") if route else part
+
+    return route
+
+
+def get_positions(resolver, chain):
+    # Posizione di ogni elemento della catena nella lista del suo resolver
+    positions = []
+    parent = resolver
+    for pattern in chain:
+        positions.append(parent.url_patterns.index(pattern))
+        parent = pattern
+
+    return positions
+
+
+def get_sample_path(chain, at_least=0):
+    try:
+        return "/" + "".join(
+            sample_regex(p.pattern.regex.pattern, at_least) for p in chain
+        )
+    except Exception:
+        return None
+
+
+def get_sample_paths(chain):
+    # Il percorso minimo (anche vuoto) e uno in cui ogni quantificatore è
+    # ripetuto almeno una volta
+    paths = []
+    for at_least in (0, 1):
+        path = get_sample_path(chain, at_least)
+        if path is not None and path not in paths:
+            paths.append(path)
+
+    return paths
+
+
+def list_routes():
+    # (catena, route, percorso di esempio, posizioni)
+    resolver = get_resolver()
+    for chain in utils.iter_url_patterns(resolver):
+        yield (
+            chain,
+            get_route(chain),
+            get_sample_path(chain),
+            get_positions(resolver, chain),
+        )
+
+
+@register(Tags.urls, utils.PERFORMANCE_TAG)
+def check_urlconf_structure(app_configs, **kwargs):
+    errors = []
+    if not getattr(settings, "ROOT_URLCONF", None):
+        return errors
+
+    resolver = get_resolver()
+    routes = list(list_routes())
+    if not routes:
+        return errors
+
+    regex_count = sum(
+        isinstance(chain[-1].pattern, RegexPattern) for chain, *_ in routes
+    )
+    route_count = sum(
+        isinstance(chain[-1].pattern, RoutePattern) for chain, *_ in routes
+    )
+    converter_count = sum(
+        len(chain[-1].pattern.converters)
+        for chain, *_ in routes
+        if isinstance(chain[-1].pattern, RoutePattern)
+    )
+    depth = max(len(chain) for chain, *_ in routes)
+    errors.append(
+        Info(
+            (
+                f"URLconf: {len(routes)} pattern, profondità massima "
+                f"{depth}, {route_count} path() con {converter_count} "
+                f"converter, {regex_count} re_path()"
+            ),
+            id="simc_djangochecks.I100",
+        )
+    )
+
+    for chain, route, _, _ in routes:
+        # Il pattern è oscurato solo se nessuno dei percorsi di esempio
+        # arriva fino a lui
+        matches = []
+        for path in get_sample_paths(chain):
+            try:
+                matches.append((path, resolver.resolve(path).route))
+            except Resolver404:
+                break
+        else:
+            if matches and all(shadow != route for _, shadow in matches):
+                path, shadow = matches[0]
+                errors.append(
+                    Warning(
+                        (
+                            f"Il pattern {route!r} è oscurato da "
+                            f"{shadow!r} (ad esempio per {path})"
+                        ),
+                        hint="Sposta il pattern più specifico prima",
+                        id="simc_djangochecks.W101",
+                    )
+                )
+
+    max_patterns = utils.get_setting("URL_MAX_PATTERNS", 200)
+    if len(resolver.url_patterns) > max_patterns:
+        errors.append(
+            Warning(
+                (
+                    f"{len(resolver.url_patterns)} pattern al primo livello "
+                    "dell'URLconf: resolve() li prova in sequenza"
+                ),
+                hint="Raggruppa i pattern per prefisso con include()",
+                id="simc_djangochecks.W102",
+            )
+        )
+
+    return errors
+
+
+@register(Tags.urls, utils.PERFORMANCE_TAG, deploy=True)
+def check_urlconf_resolve(app_configs, **kwargs):
+    errors = []
+    if not getattr(settings, "ROOT_URLCONF", None):
+        return errors
+
+    resolver = get_resolver()
+    number = utils.get_setting("URL_BENCHMARK_NUMBER", 100)
+    report_size = utils.get_setting("URL_REPORT_SIZE", 10)
+
+    timings = []
+    for chain, route, path, positions in list_routes():
+        if path is None:
+            continue
+
+        try:
+            resolver.resolve(path)
+        except Resolver404:
+            continue
+
+        duration = timeit.timeit(
+            lambda: resolver.resolve(path), number=number
+        )
+        timings.append((duration / number, route, path, positions))
+
+    for duration, route, path, positions in heapq.nlargest(
+        report_size, timings
+    ):
+        tried = sum(positions)
+        hint = None
+        if positions[0] > 0:
+            prefix = str(resolver.url_patterns[positions[0]].pattern)
+            hint = (
+                f"Se {route!r} è molto usato, spostare {prefix!r} "
+                f"(posizione {positions[0] + 1} di "
+                f"{len(resolver.url_patterns)}) prima nell'URLconf "
+                "riduce i pattern provati"
+            )
+
+        errors.append(
+            Info(
+                (
+                    f"resolve({path!r}) -> {route!r}: "
+                    f"{duration * 1e6:.1f} µs, {tried} pattern provati "
+                    "prima del match"
+                ),
+                hint=hint,
+                id="simc_djangochecks.I103",
+            )
+        )
+
+    return errors
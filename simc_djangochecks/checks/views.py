@@ -1,25 +1,26 @@
 import ast
-from pathlib import Path
 
-from django.core.checks import register, Tags, Error
+from django.apps import apps
+from django.core.checks import register, Tags, Error, Warning
 
 from simc_djangochecks import utils
 
 
 class ReturnHttpResponseVisitor(ast.NodeVisitor):
-    def __init__(self):
+    tokens = utils.register_tokens(b"HttpResponse")
+    names = utils.QualifiedNames(
+        "django.http.HttpResponse",
+        "django.http.response.HttpResponse",
+    )
+
+    def __init__(self, symbols):
         self.nodes = []
+        self.symbols = symbols
 
     def visit_Return(self, node):
-        if isinstance(node.value, ast.Call) and (
-            (
-                isinstance(node.value.func, ast.Name)
-                and node.value.func.id == "HttpResponse"
-            )
-            or (
-                isinstance(node.value.func, ast.Attribute)
-                and node.value.func.attr == "HttpResponse"
-            )
+        if (
+            isinstance(node.value, ast.Call)
+            and self.symbols.resolve(node.value.func) in self.names
         ):
             is_html = False
             if node.value.keywords:
@@ -39,21 +40,721 @@ class ReturnHttpResponseVisitor(ast.NodeVisitor):
 
 
 @register(Tags.security)
+@utils.app_scoped
 def check_response(app_configs, **kwargs):
-    errors = []
+    findings = []
     for app in utils.list_apps(app_configs):
-        for path in Path(app.path).rglob("views.py"):
-            with path.open() as fp:
-                module = ast.parse(fp.read())
-                visitor = ReturnHttpResponseVisitor()
-                visitor.visit(module)
-                for node in visitor.nodes:
-                    errors.append(
-                        Error(
-                            f"{app.name} usa HttpResponse in html",
+        for path in utils.iter_app_files(
+            app, "views.py", ReturnHttpResponseVisitor.tokens
+        ):
+            module = utils.parse_file(path)
+            visitor = ReturnHttpResponseVisitor(
+                utils.get_symbols(module, path)
+            )
+            visitor.visit(module)
+            for node in visitor.nodes:
+                findings.append(
+                    utils.locate_node(
+                        utils.Finding(
+                            Error,
+                            "{} usa HttpResponse in html",
+                            app.name,
                             hint="Usa un template",
                             id="simc_djangochecks.E014",
-                        )
+                        ),
+                        path, module, node,
+                    )
+                )
+
+    return utils.to_messages(findings)
+
+
+QUERYSET_METHODS = (
+    "all",
+    "filter",
+    "exclude",
+    "order_by",
+    "reverse",
+    "distinct",
+    "annotate",
+    "alias",
+    "only",
+    "defer",
+    "using",
+    "select_for_update",
+    "select_related",
+    "prefetch_related",
+)
+
+
+def get_prefetch_lookups(node):
+    lookups = set()
+    if node.func.attr == "select_related" and not node.args:
+        lookups.add("*")
+
+    for arg in node.args:
+        if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+            lookups.add(arg.value)
+        elif (
+            isinstance(arg, ast.Call)
+            and arg.args
+            and isinstance(arg.args[0], ast.Constant)
+        ):
+            # Prefetch("lookup", queryset=...)
+            lookups.add(arg.args[0].value)
+
+    return lookups
+
+
+def get_queryset_info(node, querysets):
+    lookups = set()
+    is_queryset = False
+    while (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+    ):
+        if node.func.attr not in QUERYSET_METHODS:
+            return None
+
+        if node.func.attr in ("select_related", "prefetch_related"):
+            lookups |= get_prefetch_lookups(node)
+
+        is_queryset = True
+        node = node.func.value
+
+    # Model.objects.<method>(...)
+    if (
+        is_queryset
+        and isinstance(node, ast.Attribute)
+        and node.attr == "objects"
+        and isinstance(node.value, ast.Name)
+    ):
+        return node.value.id, frozenset(lookups)
+
+    # queryset = Model.objects.<method>(...)
+    if isinstance(node, ast.Name) and node.id in querysets:
+        model_name, previous_lookups = querysets[node.id]
+        return model_name, previous_lookups | lookups
+
+    return None
+
+
+class QuerysetVisitor(ast.NodeVisitor):
+    tokens = utils.register_tokens(b"objects")
+
+    def __init__(self):
+        self.nodes = []
+        self.querysets = {}
+
+    def visit_FunctionDef(self, node):
+        querysets = self.querysets
+        self.querysets = {}
+        self.generic_visit(node)
+        self.querysets = querysets
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Assign(self, node):
+        info = get_queryset_info(node.value, self.querysets)
+        for target in node.targets:
+            if isinstance(target, ast.Name):
+                if info is None:
+                    self.querysets.pop(target.id, None)
+                else:
+                    self.querysets[target.id] = info
+
+        self.generic_visit(node)
+
+    def get_queryset_info(self, node):
+        return get_queryset_info(node, self.querysets)
+
+
+def get_related_fields(model):
+    fields = {}
+    for field in model._meta.get_fields():
+        if not field.is_relation:
+            continue
+
+        if field.auto_created and not field.concrete:
+            fields[field.get_accessor_name()] = field
+        else:
+            fields[field.name] = field
+
+    return fields
+
+
+def resolve_relation_path(model_name, attrs):
+    for model in apps.get_models():
+        if model.__name__ != model_name:
+            continue
+
+        path = []
+        current = model
+        for attr in attrs:
+            field = get_related_fields(current).get(attr)
+            if field is None:
+                break
+
+            path.append((attr, field))
+            current = field.related_model
+            if current is None:
+                break
+
+        if path:
+            return path
+
+    return []
+
+
+def is_covered(path, lookups):
+    for i in range(1, len(path) + 1):
+        lookup = "__".join(name for name, _ in path[:i])
+        field = path[i - 1][1]
+        if lookup in lookups:
+            continue
+
+        if (
+            "*" in lookups
+            and field.concrete
+            and (field.many_to_one or field.one_to_one)
+        ):
+            continue
+
+        return False
+
+    return True
+
+
+def get_attribute_chain(node, name):
+    attrs = []
+    while isinstance(node, ast.Attribute):
+        attrs.insert(0, node.attr)
+        node = node.value
+
+    if isinstance(node, ast.Name) and node.id == name:
+        return attrs
+
+    return None
+
+
+class NPlusOneVisitor(QuerysetVisitor):
+    def check_loop(self, node, target, info, body):
+        if not isinstance(target, ast.Name):
+            return
+
+        model_name, lookups = info
+        paths = {}
+        for stmt in body:
+            for child in ast.walk(stmt):
+                attrs = get_attribute_chain(child, target.id)
+                if not attrs:
+                    continue
+
+                path = resolve_relation_path(model_name, attrs)
+                if path and not is_covered(path, lookups):
+                    paths["__".join(name for name, _ in path)] = path
+
+        for lookup, path in sorted(paths.items()):
+            if any(
+                other.startswith(f"{lookup}__") for other in paths
+            ):
+                continue
+
+            self.nodes.append((node, model_name, target.id, path))
+
+    def visit_For(self, node):
+        info = self.get_queryset_info(node.iter)
+        if info is not None:
+            self.check_loop(node, node.target, info, node.body)
+
+        self.generic_visit(node)
+
+    def visit_ListComp(self, node):
+        for generator in node.generators:
+            info = self.get_queryset_info(generator.iter)
+            if info is not None:
+                if isinstance(node, ast.DictComp):
+                    body = [node.key, node.value]
+                else:
+                    body = [node.elt]
+
+                self.check_loop(
+                    node, generator.target, info, body + generator.ifs
+                )
+
+        self.generic_visit(node)
+
+    visit_SetComp = visit_ListComp
+    visit_GeneratorExp = visit_ListComp
+    visit_DictComp = visit_ListComp
+
+
+@register(Tags.models, utils.PERFORMANCE_TAG)
+@utils.app_scoped
+def check_n_plus_one(app_configs, **kwargs):
+    findings = []
+    for app in utils.list_apps(app_configs):
+        for path in utils.iter_app_files(app, "*.py", NPlusOneVisitor.tokens):
+            module = utils.parse_file(path)
+            visitor = NPlusOneVisitor()
+            visitor.visit(module)
+            for node, model_name, name, relation in visitor.nodes:
+                lookup = "__".join(attr for attr, _ in relation)
+                attrs = ".".join(attr for attr, _ in relation)
+                if all(
+                    field.concrete
+                    and (field.many_to_one or field.one_to_one)
+                    for _, field in relation
+                ):
+                    method = "select_related"
+                else:
+                    method = "prefetch_related"
+
+                findings.append(
+                    utils.locate_node(
+                        utils.Finding(
+                            Warning,
+                            (
+                                "{}:{} possibile query N+1: accesso a {}.{} "
+                                "in un ciclo su {} senza "
+                                "select_related/prefetch_related"
+                            ),
+                            path,
+                            node.lineno,
+                            name,
+                            attrs,
+                            model_name,
+                            hint=f"Usa {method}(\"{lookup}\")",
+                            id="simc_djangochecks.W068",
+                        ),
+                        path, module, node,
+                    )
+                )
+
+    return utils.to_messages(findings)
+
+
+TEMPLATE_RENDER_FUNCTIONS = {
+    "render": 2,
+    "render_to_response": 1,
+    "render_to_string": 1,
+    "TemplateResponse": 2,
+}
+
+
+class UnboundedQuerysetVisitor(QuerysetVisitor):
+    tokens = utils.register_tokens(b"objects", b"ListView")
+
+    def is_queryset(self, node):
+        return self.get_queryset_info(node) is not None
+
+    def check_test(self, node, test):
+        if isinstance(test, ast.BoolOp):
+            for value in test.values:
+                self.check_test(node, value)
+        elif isinstance(test, ast.UnaryOp) and isinstance(test.op, ast.Not):
+            self.check_test(node, test.operand)
+        elif self.is_queryset(test):
+            self.nodes.append(("exists", node, None))
+
+    def visit_If(self, node):
+        self.check_test(node, node.test)
+        self.generic_visit(node)
+
+    visit_While = visit_If
+    visit_IfExp = visit_If
+
+    def visit_Call(self, node):
+        if isinstance(node.func, ast.Name):
+            name = node.func.id
+        elif isinstance(node.func, ast.Attribute):
+            name = node.func.attr
+        else:
+            name = None
+
+        if name == "len" and node.args and self.is_queryset(node.args[0]):
+            self.nodes.append(("count", node, None))
+        elif (
+            name in ("list", "tuple", "set", "sorted")
+            and node.args
+            and self.is_queryset(node.args[0])
+        ):
+            self.nodes.append(("list", node, name))
+        elif name in TEMPLATE_RENDER_FUNCTIONS:
+            position = TEMPLATE_RENDER_FUNCTIONS[name]
+            context = None
+            if len(node.args) > position:
+                context = node.args[position]
+
+            for keyword in node.keywords:
+                if keyword.arg == "context":
+                    context = keyword.value
+
+            if isinstance(context, ast.Dict):
+                for key, value in zip(context.keys, context.values):
+                    if (
+                        isinstance(key, ast.Constant)
+                        and self.is_queryset(value)
+                    ):
+                        self.nodes.append(("context", node, key.value))
+
+        self.generic_visit(node)
+
+    def visit_Subscript(self, node):
+        if (
+            isinstance(node.slice, ast.Constant)
+            and isinstance(node.slice.value, int)
+            and self.is_queryset(node.value)
+        ):
+            self.nodes.append(("first", node, None))
+
+        self.generic_visit(node)
+
+    def visit_Assign(self, node):
+        # context["name"] = queryset
+        for target in node.targets:
+            if (
+                isinstance(target, ast.Subscript)
+                and isinstance(target.value, ast.Name)
+                and target.value.id in ("context", "ctx", "kwargs")
+                and isinstance(target.slice, ast.Constant)
+                and self.is_queryset(node.value)
+            ):
+                self.nodes.append(("context", node, target.slice.value))
+
+        super().visit_Assign(node)
+
+    def visit_ClassDef(self, node):
+        is_list_view = False
+        for base in node.bases:
+            if (
+                (isinstance(base, ast.Name) and base.id == "ListView")
+                or (
+                    isinstance(base, ast.Attribute)
+                    and base.attr == "ListView"
+                )
+            ):
+                is_list_view = True
+
+        if is_list_view:
+            paginated = False
+            for stmt in node.body:
+                if isinstance(stmt, ast.Assign):
+                    for target in stmt.targets:
+                        if (
+                            isinstance(target, ast.Name)
+                            and target.id == "paginate_by"
+                        ):
+                            paginated = True
+                elif (
+                    isinstance(stmt, ast.FunctionDef)
+                    and stmt.name == "get_paginate_by"
+                ):
+                    paginated = True
+
+            if not paginated:
+                self.nodes.append(("paginate", node, node.name))
+
+        self.generic_visit(node)
+
+
+UNBOUNDED_QUERYSET_MESSAGES = {
+    "count": (
+        "usa len() su un queryset",
+        "Usa .count()",
+        "simc_djangochecks.W069",
+    ),
+    "exists": (
+        "valuta un queryset come booleano",
+        "Usa .exists()",
+        "simc_djangochecks.W070",
+    ),
+    "list": (
+        "converte con {} un queryset non limitato",
+        "Limita il queryset con uno slice o usa .iterator()",
+        "simc_djangochecks.W071",
+    ),
+    "first": (
+        "accede per indice a un queryset",
+        "Usa .first() o .get()",
+        "simc_djangochecks.W072",
+    ),
+    "paginate": (
+        "ListView {} senza paginate_by",
+        "Imposta paginate_by",
+        "simc_djangochecks.W073",
+    ),
+    "context": (
+        "passa un queryset non limitato al template come '{}'",
+        "Usa la paginazione o uno slice del queryset",
+        "simc_djangochecks.W074",
+    ),
+}
+
+
+@register(Tags.models, utils.PERFORMANCE_TAG)
+@utils.app_scoped
+def check_unbounded_querysets(app_configs, **kwargs):
+    findings = []
+    for app in utils.list_apps(app_configs):
+        for path in utils.iter_app_files(
+            app, "*.py", UnboundedQuerysetVisitor.tokens
+        ):
+            module = utils.parse_file(path)
+            visitor = UnboundedQuerysetVisitor()
+            visitor.visit(module)
+            for kind, node, detail in visitor.nodes:
+                msg, hint, id = UNBOUNDED_QUERYSET_MESSAGES[kind]
+                findings.append(
+                    utils.locate_node(
+                        utils.Finding(
+                            Warning,
+                            "{}:{} " + msg,
+                            path,
+                            node.lineno,
+                            detail,
+                            hint=hint,
+                            id=id,
+                        ),
+                        path, module, node,
+                    )
+                )
+
+    return utils.to_messages(findings)
+
+
+BLOCKING_NAMES = utils.QualifiedNames(
+    "time.sleep",
+    "requests.*",
+    "urllib.request.urlopen",
+    "subprocess.*",
+    "socket.create_connection",
+    "smtplib.*",
+    "os.system",
+    "builtins.open",
+    "builtins.input",
+    "httpx.get",
+    "httpx.post",
+    "httpx.put",
+    "httpx.patch",
+    "httpx.delete",
+    "httpx.head",
+    "httpx.options",
+    "httpx.request",
+    "httpx.stream",
+    "httpx.Client",
+)
+
+# Le chiamate passate a questi nomi vengono eseguite fuori dall'event loop
+OFFLOAD_NAMES = utils.QualifiedNames(
+    "asgiref.sync.sync_to_async",
+    "asyncio.to_thread",
+)
+
+QUERYSET_TERMINAL_METHODS = (
+    "get",
+    "first",
+    "last",
+    "earliest",
+    "latest",
+    "count",
+    "exists",
+    "contains",
+    "aggregate",
+    "in_bulk",
+    "iterator",
+    "create",
+    "get_or_create",
+    "update_or_create",
+    "bulk_create",
+    "bulk_update",
+    "update",
+    "delete",
+)
+
+MODEL_METHODS = ("save", "delete", "refresh_from_db")
+
+# Metodi del manager o del queryset che restituiscono un'istanza del modello
+MODEL_INSTANCE_METHODS = (
+    "get",
+    "first",
+    "last",
+    "earliest",
+    "latest",
+    "create",
+)
+
+QUERYSET_EVALUATION_FUNCTIONS = utils.QualifiedNames(
+    "builtins.list",
+    "builtins.tuple",
+    "builtins.set",
+    "builtins.sorted",
+    "builtins.len",
+    "builtins.bool",
+)
+
+
+def is_manager(node):
+    return (
+        isinstance(node, ast.Attribute)
+        and node.attr == "objects"
+        and isinstance(node.value, ast.Name)
+    )
+
+
+class BlockingCallVisitor(QuerysetVisitor):
+    tokens = utils.register_tokens(b"async")
+
+    def __init__(self, symbols):
+        super().__init__()
+        self.symbols = symbols
+        self.function = None
+        # Variabili che contengono un'istanza di un modello
+        self.instances = set()
+        self.model_names = {model.__name__ for model in apps.get_models()}
+
+    def visit_FunctionDef(self, node):
+        # Una funzione sincrona annidata non gira necessariamente
+        # nell'event loop (ad esempio se passata a sync_to_async)
+        function = self.function
+        instances = self.instances
+        self.function = None
+        self.instances = set()
+        super().visit_FunctionDef(node)
+        self.function = function
+        self.instances = instances
+
+    def visit_AsyncFunctionDef(self, node):
+        function = self.function
+        instances = self.instances
+        self.function = node.name
+        self.instances = set()
+        super().visit_FunctionDef(node)
+        self.function = function
+        self.instances = instances
+
+    def is_model_instance(self, node):
+        if isinstance(node, ast.Name):
+            return node.id in self.instances
+
+        if not isinstance(node, ast.Call):
+            return False
+
+        # Model(...)
+        if isinstance(node.func, ast.Name):
+            return node.func.id in self.model_names
+
+        # Model.objects.get(...), queryset.first(), ...
+        return (
+            isinstance(node.func, ast.Attribute)
+            and node.func.attr in MODEL_INSTANCE_METHODS
+            and (
+                is_manager(node.func.value)
+                or self.get_queryset_info(node.func.value) is not None
+            )
+        )
+
+    def visit_Assign(self, node):
+        is_instance = self.is_model_instance(node.value)
+        for target in node.targets:
+            if isinstance(target, ast.Name):
+                if is_instance:
+                    self.instances.add(target.id)
+                else:
+                    self.instances.discard(target.id)
+
+        super().visit_Assign(node)
+
+    def visit_Lambda(self, node):
+        function = self.function
+        self.function = None
+        self.generic_visit(node)
+        self.function = function
+
+    def visit_For(self, node):
+        if self.get_queryset_info(node.iter) is not None:
+            if self.function is not None:
+                self.nodes.append((node, "iterazione di un queryset"))
+
+            if isinstance(node.target, ast.Name):
+                self.instances.add(node.target.id)
+
+        self.generic_visit(node)
+
+    def get_blocking_call(self, node, qualname):
+        if qualname in BLOCKING_NAMES:
+            return qualname.removeprefix("builtins.")
+
+        if (
+            qualname in QUERYSET_EVALUATION_FUNCTIONS
+            and node.args
+            and self.get_queryset_info(node.args[0]) is not None
+        ):
+            return f"{qualname.removeprefix('builtins.')}() su un queryset"
+
+        if isinstance(node.func, ast.Attribute):
+            attr = node.func.attr
+            value = node.func.value
+            if attr in QUERYSET_TERMINAL_METHODS and (
+                is_manager(value) or self.get_queryset_info(value) is not None
+            ):
+                return f"{attr}() su un queryset"
+
+            # Solo su istanze riconosciute: cache.delete() non è una query
+            if attr in MODEL_METHODS and self.is_model_instance(value):
+                return f"{attr}()"
+
+        return None
+
+    def visit_Call(self, node):
+        if self.function is None:
+            self.generic_visit(node)
+            return
+
+        qualname = self.symbols.resolve(node.func)
+        if qualname in OFFLOAD_NAMES or (
+            isinstance(node.func, ast.Attribute)
+            and node.func.attr == "run_in_executor"
+        ):
+            return
+
+        blocking = self.get_blocking_call(node, qualname)
+        if blocking is not None:
+            self.nodes.append((node, blocking))
+
+        self.generic_visit(node)
+
+
+@register(Tags.async_support, utils.PERFORMANCE_TAG)
+@utils.app_scoped
+def check_blocking_calls(app_configs, **kwargs):
+    findings = []
+    for app in utils.list_apps(app_configs):
+        for path in utils.iter_app_files(
+            app, "*.py", BlockingCallVisitor.tokens
+        ):
+            module = utils.parse_file(path)
+            visitor = BlockingCallVisitor(utils.get_symbols(module, path))
+            visitor.visit(module)
+            for node, blocking in visitor.nodes:
+                findings.append(
+                    utils.locate_node(
+                        utils.Finding(
+                            Warning,
+                            "{}:{} operazione bloccante in una funzione "
+                            "asincrona: {}",
+                            path,
+                            node.lineno,
+                            blocking,
+                            hint=(
+                                "Usa sync_to_async, asyncio.to_thread o i "
+                                "metodi asincroni dell'ORM (aget, acount, "
+                                "async for, ...)"
+                            ),
+                            id="simc_djangochecks.W092",
+                        ),
+                        path, module, node,
                     )
+                )
 
-    return errors
+    return utils.to_messages(findings)
@@ -0,0 +1,146 @@
+import os
+
+from django.apps import apps
+from django.core import checks
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from simc_djangochecks import runner, utils
+
+
+class Command(BaseCommand):
+    help = "Esegue in parallelo i check registrati da simc_djangochecks."
+
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("args", metavar="app_label", nargs="*")
+        parser.add_argument(
+            "--tag",
+            "-t",
+            action="append",
+            dest="tags",
+            help="Esegue solo i check con il tag indicato.",
+        )
+        parser.add_argument(
+            "--deploy",
+            action="store_true",
+            help="Esegue anche i check di deploy.",
+        )
+        parser.add_argument(
+            "--fail-level",
+            default="ERROR",
+            choices=["CRITICAL", "ERROR", "WARNING", "INFO", "DEBUG"],
+            help=(
+                "Livello dei messaggi che causa un exit status diverso "
+                "da zero. Default: ERROR."
+            ),
+        )
+        parser.add_argument(
+            "--database",
+            action="append",
+            choices=tuple(connections),
+            dest="databases",
+            help="Esegue i check sul database per questi alias.",
+        )
+        parser.add_argument(
+            "--executor",
+            default="thread",
+            choices=["thread", "process"],
+            help="Pool usato per eseguire i check. Default: thread.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Numero di worker del pool. Default: numero di CPU.",
+        )
+        parser.add_argument(
+            "--baseline",
+            help=(
+                "Riporta solo i messaggi che non sono nel file di baseline."
+            ),
+        )
+        parser.add_argument(
+            "--write-baseline",
+            help="Scrive i fingerprint dei messaggi nel file di baseline.",
+        )
+        parser.add_argument(
+            "--shard",
+            help=(
+                "Analizza solo i file dello shard i di N (formato i/N, "
+                "1 <= i <= N)."
+            ),
+        )
+        parser.add_argument(
+            "--output",
+            help=(
+                "Scrive i messaggi in un file parziale invece di "
+                "riportarli (vedi simc_check_merge)."
+            ),
+        )
+
+    def handle(self, *app_labels, **options):
+        if options["shard"]:
+            os.environ[utils.SHARD_ENVIRONMENT_VARIABLE] = options["shard"]
+            try:
+                utils.get_shard()
+            except ValueError as e:
+                raise CommandError(e)
+
+        for app_label in app_labels:
+            apps.get_app_config(app_label)
+
+        check_functions = runner.get_checks(
+            options["tags"], options["deploy"]
+        )
+        if options["tags"] and not check_functions:
+            raise CommandError(
+                "Nessun check simc_djangochecks con i tag "
+                f"{', '.join(options['tags'])}"
+            )
+
+        all_issues, timings, elapsed = runner.run_checks(
+            check_functions,
+            app_labels=app_labels,
+            databases=options["databases"],
+            executor=options["executor"],
+            workers=options["workers"],
+        )
+
+        if options["write_baseline"]:
+            runner.write_baseline(options["write_baseline"], all_issues)
+
+        if options["baseline"]:
+            all_issues = runner.filter_baseline(
+                all_issues, runner.read_baseline(options["baseline"])
+            )
+
+        # Rapporto tra il tempo di CPU dei singoli check (misurato sul
+        # thread o processo che li esegue) e il tempo trascorso.
+        cpu_time = sum(duration for _, duration in timings)
+        speedup = cpu_time / elapsed if elapsed else 1.0
+        summary = (
+            f"{len(check_functions)} check eseguiti in {elapsed:.2f}s "
+            f"({cpu_time:.2f}s di CPU, speedup {speedup:.1f}x)."
+        )
+        if options["executor"] == "thread":
+            summary += f" {utils.get_module_cache().stats()}."
+
+        peak_rss = runner.get_peak_rss()
+        if peak_rss is not None:
+            summary += f" Picco RSS: {peak_rss // 2 ** 20} MiB."
+
+        if options["output"]:
+            runner.write_messages(
+                options["output"], all_issues, shard=options["shard"]
+            )
+            self.stdout.write(
+                f"{len(all_issues)} messaggi scritti in {options['output']}. "
+                + summary
+            )
+            return
+
+        runner.report(
+            self, all_issues, getattr(checks, options["fail_level"]), summary
+        )
@@ -0,0 +1,47 @@
+from django.core import checks
+from django.core.management.base import BaseCommand
+
+from simc_djangochecks import runner
+
+
+class Command(BaseCommand):
+    help = (
+        "Unisce i file parziali scritti da simc_check --shard --output e "
+        "riporta i messaggi con lo stesso exit status di check."
+    )
+
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("args", metavar="path", nargs="+")
+        parser.add_argument(
+            "--fail-level",
+            default="ERROR",
+            choices=["CRITICAL", "ERROR", "WARNING", "INFO", "DEBUG"],
+            help=(
+                "Livello dei messaggi che causa un exit status diverso "
+                "da zero. Default: ERROR."
+            ),
+        )
+        parser.add_argument(
+            "--baseline",
+            help=(
+                "Riporta solo i messaggi che non sono nel file di baseline."
+            ),
+        )
+
+    def handle(self, *paths, **options):
+        all_issues = runner.merge_messages(
+            *(runner.read_messages(path) for path in paths)
+        )
+        if options["baseline"]:
+            all_issues = runner.filter_baseline(
+                all_issues, runner.read_baseline(options["baseline"])
+            )
+
+        runner.report(
+            self,
+            all_issues,
+            getattr(checks, options["fail_level"]),
+            f"{len(paths)} file parziali uniti.",
+        )
@@ -0,0 +1,69 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from simc_djangochecks import report, runner, utils
+
+
+class Command(BaseCommand):
+    help = (
+        "Esegue i check sui sorgenti di simc_djangochecks e scrive un "
+        "report firmato, usato a runtime al posto dell'analisi finché i "
+        "file e i settings non cambiano."
+    )
+
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default=utils.get_setting("REPORT"),
+            help="File del report. Default: SIMC_DJANGOCHECKS_REPORT.",
+        )
+        parser.add_argument(
+            "--executor",
+            default="thread",
+            choices=["thread", "process"],
+            help="Pool usato per eseguire i check. Default: thread.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Numero di worker del pool. Default: numero di CPU.",
+        )
+
+    def handle(self, **options):
+        if not options["output"]:
+            raise CommandError(
+                "Indicare --output o SIMC_DJANGOCHECKS_REPORT"
+            )
+
+        # Il report esistente non deve sostituire l'analisi
+        report.report_cache[utils.get_setting("REPORT")] = None
+
+        # Gli altri check dipendono dall'ambiente di esecuzione
+        check_functions = [
+            check
+            for check in runner.get_checks(include_deployment_checks=True)
+            if getattr(check, "source_scoped", False)
+        ]
+        try:
+            with runner.get_executor(
+                options["executor"], options["workers"]
+            ) as pool:
+                results = list(pool.map(runner.run_check, check_functions))
+        finally:
+            utils.clear_module_cache()
+
+        report.write_report(
+            options["output"],
+            [
+                (check, messages)
+                for check, (messages, _) in zip(check_functions, results)
+            ],
+        )
+        self.stdout.write(
+            f"Report di {len(check_functions)} check scritto in "
+            f"{options['output']}."
+        )
@@ -0,0 +1,100 @@
+import cProfile
+import functools
+import os
+import threading
+import tracemalloc
+
+from django.core.checks.registry import registry
+
+
+PROFILE_ENVIRONMENT_VARIABLE = "SIMC_DJANGOCHECKS_PROFILE_DIR"
+
+TRACEMALLOC_FRAMES = 10
+
+TOP_ALLOCATIONS = 30
+
+tracing_lock = threading.Lock()
+tracing_users = 0
+tracing_owner = False
+
+
+def start_tracing():
+    global tracing_users, tracing_owner
+
+    with tracing_lock:
+        if tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            tracing_owner = True
+
+        tracing_users += 1
+
+    return tracemalloc.take_snapshot()
+
+
+def stop_tracing():
+    global tracing_users, tracing_owner
+
+    with tracing_lock:
+        tracing_users -= 1
+        if tracing_users == 0 and tracing_owner:
+            tracemalloc.stop()
+            tracing_owner = False
+
+
+def is_enabled():
+    return bool(os.environ.get(PROFILE_ENVIRONMENT_VARIABLE))
+
+
+def write_allocations(path, name, before, after):
+    filters = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, cProfile.__file__),
+    ]
+    stats = after.filter_traces(filters).compare_to(
+        before.filter_traces(filters), "lineno"
+    )
+    size = sum(stat.size_diff for stat in stats)
+    with open(path, "w") as fp:
+        fp.write(f"{name}: {size / 1024:.1f} KiB allocati\n\n")
+        for stat in stats[:TOP_ALLOCATIONS]:
+            fp.write(f"{stat}\n")
+
+
+class ProfiledCheck:
+    # Una classe invece di una closure: con l'executor a processi il check
+    # deve poter essere serializzato con pickle
+    def __init__(self, check, directory):
+        functools.update_wrapper(self, check)
+        self.directory = directory
+
+    def __call__(self, *args, **kwargs):
+        name = f"{self.__module__}.{self.__qualname__}"
+        profiler = cProfile.Profile()
+        before = start_tracing()
+        try:
+            return profiler.runcall(self.__wrapped__, *args, **kwargs)
+        finally:
+            after = tracemalloc.take_snapshot()
+            stop_tracing()
+            profiler.dump_stats(
+                os.path.join(self.directory, f"{name}.pstats")
+            )
+            write_allocations(
+                os.path.join(self.directory, f"{name}.alloc.txt"),
+                name,
+                before,
+                after,
+            )
+
+
+def install():
+    directory = os.environ.get(PROFILE_ENVIRONMENT_VARIABLE)
+    if not directory:
+        return
+
+    os.makedirs(directory, exist_ok=True)
+    for checks in (registry.registered_checks, registry.deployment_checks):
+        for check in list(checks):
+            if check.__module__.startswith("simc_djangochecks."):
+                checks.discard(check)
+                checks.add(ProfiledCheck(check, directory))
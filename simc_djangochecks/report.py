@@ -0,0 +1,209 @@
+import functools
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.core.checks.registry import registry
+
+from simc_djangochecks import runner, thirdparty, utils
+
+
+SALT = "simc_djangochecks.report"
+
+# Settings di Django letti dai check sui sorgenti, oltre a quelli di
+# simc_djangochecks
+FINGERPRINT_SETTINGS = (
+    "BASE_DIR",
+    "INSTALLED_APPS",
+    "ROOT_URLCONF",
+    "TEMPLATES",
+)
+
+# Cambiano tra build e runtime e non influiscono sull'analisi del codice
+EXCLUDED_SETTINGS = (
+    "SIMC_DJANGOCHECKS_REPORT",
+    "SIMC_DJANGOCHECKS_REPORT_KEY",
+)
+
+
+def get_check_name(check):
+    return f"{check.__module__}.{check.__qualname__}"
+
+
+def list_fingerprint_dirs():
+    dirs = [app.path for app in utils.list_first_party_apps()]
+    for template in settings.TEMPLATES:
+        dirs += template.get("DIRS", [])
+
+    return dirs
+
+
+def list_fingerprint_files():
+    # File letti dai check fuori dalle directory delle app
+    files = []
+    urlconf = getattr(settings, "ROOT_URLCONF", None)
+    if urlconf:
+        try:
+            spec = importlib.util.find_spec(urlconf)
+        except (ImportError, ValueError):
+            spec = None
+
+        if spec is not None and spec.origin:
+            files.append(spec.origin)
+
+    rules_file = utils.get_setting("RULES_FILE")
+    if rules_file is not None:
+        files.append(rules_file)
+
+    return files
+
+
+def update_stat(digest, path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        digest.update(f"{path}\0\n".encode())
+        return
+
+    digest.update(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+
+
+def to_json(value):
+    # Oggetti non serializzabili: il nome qualificato invece della repr, che
+    # può contenere indirizzi di memoria
+    if isinstance(value, os.PathLike):
+        return os.fspath(value)
+
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+
+    if not hasattr(value, "__qualname__"):
+        value = type(value)
+
+    return f"{value.__module__}.{value.__qualname__}"
+
+
+def list_fingerprint_settings():
+    excluded = set(EXCLUDED_SETTINGS) | set(
+        utils.get_setting("REPORT_EXCLUDED_SETTINGS", ())
+    )
+    return [
+        name
+        for name in sorted(dir(settings))
+        if (
+            name in FINGERPRINT_SETTINGS
+            or name.startswith("SIMC_DJANGOCHECKS_")
+        )
+        and name not in excluded
+    ]
+
+
+def get_fingerprint():
+    digest = hashlib.sha1(thirdparty.get_rules_hash().encode())
+    for root in list_fingerprint_dirs():
+        for path in sorted(Path(root).rglob("*")):
+            if "__pycache__" in path.parts or not path.is_file():
+                continue
+
+            update_stat(digest, path)
+
+    for path in list_fingerprint_files():
+        update_stat(digest, path)
+
+    # Le dipendenze cambiano solo con la versione della distribuzione
+    for app in utils.list_third_party_apps():
+        name, version = utils.get_distribution(app.path)
+        digest.update(f"{app.name}\0{name}\0{version}\n".encode())
+
+    for name in list_fingerprint_settings():
+        value = json.dumps(
+            getattr(settings, name), sort_keys=True, default=to_json
+        )
+        digest.update(f"{name}={value}\n".encode())
+
+    return digest.hexdigest()
+
+
+def get_signing_key():
+    return utils.get_setting("REPORT_KEY") or settings.SECRET_KEY
+
+
+def write_report(path, results):
+    data = {
+        "fingerprint": get_fingerprint(),
+        "checks": {
+            get_check_name(check): [
+                runner.serialize_message(m) for m in messages
+            ]
+            for check, messages in results
+        },
+    }
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as fp:
+        fp.write(
+            signing.dumps(
+                data, key=get_signing_key(), salt=SALT, compress=True
+            )
+        )
+
+    os.replace(tmp_path, path)
+
+
+def read_report(path):
+    try:
+        with open(path) as fp:
+            data = signing.loads(fp.read(), key=get_signing_key(), salt=SALT)
+    except (OSError, signing.BadSignature):
+        return None
+
+    # Il report vale solo per gli stessi file e settings della build
+    if data["fingerprint"] != get_fingerprint():
+        return None
+
+    return data["checks"]
+
+
+report_lock = threading.Lock()
+report_cache = {}
+
+
+def get_report():
+    path = utils.get_setting("REPORT")
+    with report_lock:
+        if path not in report_cache:
+            report_cache[path] = read_report(path)
+
+        return report_cache[path]
+
+
+class ReportCheck:
+    # Una classe invece di una closure: con l'executor a processi il check
+    # deve poter essere serializzato con pickle
+    def __init__(self, check):
+        functools.update_wrapper(self, check)
+
+    def __call__(self, app_configs=None, **kwargs):
+        report = None if app_configs else get_report()
+        name = get_check_name(self)
+        if report is None or name not in report:
+            return self.__wrapped__(app_configs=app_configs, **kwargs)
+
+        return [runner.deserialize_message(m) for m in report[name]]
+
+
+def install():
+    if not utils.get_setting("REPORT"):
+        return
+
+    # Solo i check sui sorgenti: gli altri dipendono dall'ambiente di
+    # esecuzione (database, STATIC_ROOT, permessi dei file, ...)
+    for checks in (registry.registered_checks, registry.deployment_checks):
+        for check in list(checks):
+            if getattr(check, "source_scoped", False):
+                checks.discard(check)
+                checks.add(ReportCheck(check))
@@ -0,0 +1,301 @@
+import json
+import multiprocessing
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.apps import apps
+from django.core import checks
+from django.core.checks.registry import registry
+from django.core.management.base import SystemCheckError
+from django.db.models.base import ModelBase
+
+from simc_djangochecks import profiling, utils
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def get_checks(tags=None, include_deployment_checks=False):
+    simc_checks = [
+        check
+        for check in registry.get_checks(include_deployment_checks)
+        if check.__module__.startswith("simc_djangochecks.")
+    ]
+    if tags:
+        simc_checks = [
+            check
+            for check in simc_checks
+            if not set(check.tags).isdisjoint(tags)
+        ]
+
+    return sorted(
+        simc_checks, key=lambda check: (check.__module__, check.__qualname__)
+    )
+
+
+def setup_worker():
+    if not apps.ready:
+        django.setup()
+
+
+def run_check(check, app_labels=None, databases=None):
+    if app_labels:
+        app_configs = [apps.get_app_config(label) for label in app_labels]
+    else:
+        app_configs = None
+
+    # Tempo di CPU del thread: il tempo reale di un check eseguito in
+    # parallelo include anche l'attesa degli altri thread per il GIL
+    start = time.thread_time()
+    messages = list(
+        check(app_configs=app_configs, databases=databases) or []
+    )
+    return messages, time.thread_time() - start
+
+
+def get_executor(executor, workers):
+    if executor == "process":
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context(
+            "fork" if "fork" in methods else None
+        )
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=setup_worker,
+        )
+
+    # Un solo profiler alla volta per processo: da Python 3.12 un secondo
+    # cProfile attivo solleva un'eccezione, e le allocazioni dei check
+    # concorrenti finirebbero nello stesso snapshot
+    if profiling.is_enabled():
+        workers = 1
+
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+def run_checks(
+    check_functions,
+    app_labels=None,
+    databases=None,
+    executor="thread",
+    workers=None,
+):
+    start = time.perf_counter()
+    try:
+        with get_executor(executor, workers) as pool:
+            futures = {
+                check: pool.submit(run_check, check, app_labels, databases)
+                for check in check_functions
+                if not getattr(check, "serial", False)
+            }
+            results = {
+                check: future.result() for check, future in futures.items()
+            }
+
+        for check in check_functions:
+            if check not in results:
+                results[check] = run_check(check, app_labels, databases)
+    finally:
+        utils.clear_module_cache()
+
+    results = [results[check] for check in check_functions]
+
+    elapsed = time.perf_counter() - start
+    messages = [message for result, _ in results for message in result]
+    timings = [
+        (check, duration)
+        for check, (_, duration) in zip(check_functions, results)
+    ]
+    return messages, timings, elapsed
+
+
+def get_peak_rss():
+    if resource is None:
+        return None
+
+    # ru_maxrss è in KiB su Linux e in byte su macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    return max(
+        resource.getrusage(who).ru_maxrss * unit
+        for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)
+    )
+
+
+def format_messages(style, all_issues):
+    levels = (
+        (checks.CRITICAL, None, "CRITICALS"),
+        (checks.ERROR, checks.CRITICAL, "ERRORS"),
+        (checks.WARNING, checks.ERROR, "WARNINGS"),
+        (checks.INFO, checks.WARNING, "INFOS"),
+        (None, checks.INFO, "DEBUGS"),
+    )
+    visible = [e for e in all_issues if not e.is_silenced()]
+    body = ""
+    for lower, upper, group_name in levels:
+        issues = [
+            e
+            for e in visible
+            if (lower is None or e.level >= lower)
+            and (upper is None or e.level < upper)
+        ]
+        if issues:
+            formatted = sorted(
+                style.ERROR(str(e))
+                if e.is_serious()
+                else style.WARNING(str(e))
+                for e in issues
+            )
+            body += "\n%s:\n%s\n" % (group_name, "\n".join(formatted))
+
+    header = "System check identified some issues:\n" if visible else ""
+    footer = "\n" if visible else ""
+    if not visible:
+        count = "no issues"
+    elif len(visible) == 1:
+        count = "1 issue"
+    else:
+        count = f"{len(visible)} issues"
+
+    footer += "System check identified %s (%s silenced)." % (
+        count, len(all_issues) - len(visible)
+    )
+    return header, body, footer
+
+
+def report(command, all_issues, fail_level, summary=""):
+    header, body, footer = format_messages(command.style, all_issues)
+    if summary:
+        footer += f"\n{summary}"
+
+    if any(
+        e.is_serious(fail_level) and not e.is_silenced()
+        for e in all_issues
+    ):
+        raise SystemCheckError(
+            command.style.ERROR(f"SystemCheckError: {header}") + body + footer
+        )
+
+    if header:
+        command.stderr.write(header + body + footer, lambda x: x)
+    else:
+        command.stdout.write(body + footer)
+
+
+def serialize_message(message):
+    obj = message.obj
+    if isinstance(obj, ModelBase):
+        obj = obj._meta.label
+    elif obj is not None:
+        obj = str(obj)
+
+    return {
+        "level": message.level,
+        "msg": message.msg,
+        "hint": message.hint,
+        "obj": obj,
+        "id": message.id,
+        "path": getattr(message, "path", None),
+        "code_hash": getattr(message, "code_hash", None),
+    }
+
+
+def deserialize_message(data):
+    message = checks.CheckMessage(
+        data["level"],
+        data["msg"],
+        hint=data["hint"],
+        obj=data["obj"],
+        id=data["id"],
+    )
+    if data.get("path") is not None:
+        message.path = data["path"]
+        message.code_hash = data["code_hash"]
+
+    return message
+
+
+def write_messages(path, messages, **metadata):
+    with open(path, "w") as fp:
+        json.dump(
+            dict(
+                metadata,
+                messages=[serialize_message(m) for m in messages],
+            ),
+            fp,
+            indent=1,
+        )
+
+
+def read_messages(path):
+    with open(path) as fp:
+        return [deserialize_message(m) for m in json.load(fp)["messages"]]
+
+
+def merge_messages(*message_lists):
+    # I check non divisi in shard riportano gli stessi messaggi in ogni
+    # file, mentre un messaggio ripetuto nello stesso file è un'occorrenza
+    # distinta: per ogni messaggio vale il massimo delle occorrenze
+    merged = Counter()
+    messages_by_key = {}
+    for messages in message_lists:
+        occurrences = Counter()
+        for message in messages:
+            key = tuple(serialize_message(message).values())
+            occurrences[key] += 1
+            messages_by_key.setdefault(key, []).append(message)
+
+        merged |= occurrences
+
+    return [
+        message
+        for key, count in merged.items()
+        for message in messages_by_key[key][:count]
+    ]
+
+
+def get_fingerprints(messages):
+    # id:path:hash del codice che contiene il messaggio:indice dell'occorrenza
+    occurrences = Counter()
+    fingerprints = []
+    for message in messages:
+        path = getattr(message, "path", None)
+        if path is None:
+            path = serialize_message(message)["obj"] or ""
+            code_hash = utils.get_code_hash(message.msg)
+        else:
+            code_hash = message.code_hash
+
+        key = f"{message.id}:{path}:{code_hash}"
+        fingerprints.append(f"{key}:{occurrences[key]}")
+        occurrences[key] += 1
+
+    return fingerprints
+
+
+def write_baseline(path, messages):
+    with open(path, "w") as fp:
+        json.dump(
+            {"fingerprints": sorted(set(get_fingerprints(messages)))},
+            fp,
+            indent=1,
+        )
+
+
+def read_baseline(path):
+    with open(path) as fp:
+        return frozenset(json.load(fp)["fingerprints"])
+
+
+def filter_baseline(messages, baseline):
+    return [
+        message
+        for message, fingerprint in zip(messages, get_fingerprints(messages))
+        if fingerprint not in baseline
+    ]
+
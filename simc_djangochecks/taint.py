@@ -0,0 +1,464 @@
+import ast
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+from simc_djangochecks import utils
+
+
+CACHE_VERSION = 1
+
+# Attributi della request con dati forniti dal client
+SOURCES = ("GET", "POST", "body", "COOKIES", "META", "FILES", "headers")
+
+SANITIZERS = utils.QualifiedNames(
+    "builtins.int",
+    "builtins.float",
+    "builtins.bool",
+    "builtins.len",
+)
+
+RAW_SQL = utils.QualifiedNames(
+    "django.db.models.RawSQL",
+    "django.db.models.expressions.RawSQL",
+)
+
+EXEC = utils.QualifiedNames("builtins.exec", "builtins.eval")
+
+EXTRA_KEYWORDS = ("extra", "extra_content")
+
+# Senza nessuno di questi token nei sorgenti non ci sono sink da analizzare
+SINK_TOKENS = utils.register_tokens(b"RawSQL", b"exec", b"eval", b"extra")
+
+
+def merge(*deps_lists):
+    merged = {}
+    for deps in deps_lists:
+        for dep in deps:
+            merged.setdefault(json.dumps(dep, sort_keys=True), dep)
+
+    return list(merged.values())
+
+
+def is_source(node):
+    if not isinstance(node, ast.Attribute) or node.attr not in SOURCES:
+        return False
+
+    value = node.value
+    return (
+        (isinstance(value, ast.Name) and value.id == "request")
+        or (isinstance(value, ast.Attribute) and value.attr == "request")
+    )
+
+
+class FunctionAnalyzer:
+    def __init__(self, node, symbols, module_name, module_functions):
+        self.node = node
+        self.symbols = symbols
+        self.module_name = module_name
+        self.module_functions = module_functions
+        self.params = [arg.arg for arg in self.get_arguments(node)]
+        self.env = {}
+
+    @staticmethod
+    def get_arguments(node):
+        args = node.args
+        return args.posonlyargs + args.args + args.kwonlyargs
+
+    def get_callee(self, func):
+        root = func
+        while isinstance(root, ast.Attribute):
+            root = root.value
+
+        if not isinstance(root, ast.Name):
+            return None
+
+        if root.id in self.module_functions and isinstance(func, ast.Name):
+            return f"{self.module_name}.{func.id}"
+
+        if root.id in self.symbols.names:
+            return self.symbols.resolve(func)
+
+        return None
+
+    def deps(self, node):
+        if node is None:
+            return []
+
+        if isinstance(node, ast.Name):
+            if node.id in self.env:
+                return self.env[node.id]
+
+            if node.id in self.params:
+                return [f"p:{self.params.index(node.id)}"]
+
+            return []
+
+        if is_source(node):
+            return ["src"]
+
+        if isinstance(node, (ast.Attribute, ast.Subscript)):
+            return self.deps(node.value)
+
+        if isinstance(node, (ast.Constant, ast.Lambda)):
+            return []
+
+        if isinstance(node, ast.Call):
+            qualname = self.symbols.resolve(node.func)
+            if qualname in SANITIZERS:
+                return []
+
+            args = [self.deps(arg) for arg in node.args]
+            kwargs = {
+                keyword.arg: self.deps(keyword.value)
+                for keyword in node.keywords
+                if keyword.arg is not None
+            }
+            callee = self.get_callee(node.func)
+            if callee is not None:
+                return [{"call": callee, "args": args, "kwargs": kwargs}]
+
+            receiver = []
+            if isinstance(node.func, ast.Attribute):
+                receiver = self.deps(node.func.value)
+
+            return merge(receiver, *args, *kwargs.values())
+
+        return merge(
+            *(self.deps(child) for child in ast.iter_child_nodes(node))
+        )
+
+    def bind(self, target, deps):
+        if isinstance(target, ast.Name):
+            self.env[target.id] = merge(self.env.get(target.id, []), deps)
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for element in target.elts:
+                self.bind(element, deps)
+        elif isinstance(target, ast.Starred):
+            self.bind(target.value, deps)
+
+    def scan(self, node):
+        for child in ast.walk(node):
+            if not isinstance(child, ast.Call):
+                continue
+
+            qualname = self.symbols.resolve(child.func)
+            if qualname in RAW_SQL and child.args:
+                self.add_sink("RawSQL", child, self.deps(child.args[0]))
+            elif qualname in EXEC and child.args:
+                self.add_sink(
+                    qualname.split(".")[-1], child, self.deps(child.args[0])
+                )
+
+            for keyword in child.keywords:
+                if keyword.arg in EXTRA_KEYWORDS:
+                    self.add_sink("extra", keyword, self.deps(keyword.value))
+
+            callee = self.get_callee(child.func)
+            if callee is not None:
+                self.calls.append({
+                    "callee": callee,
+                    "args": [self.deps(arg) for arg in child.args],
+                    "kwargs": {
+                        keyword.arg: self.deps(keyword.value)
+                        for keyword in child.keywords
+                        if keyword.arg is not None
+                    },
+                })
+
+    def add_sink(self, kind, node, deps):
+        if deps:
+            self.sinks.append(
+                {"kind": kind, "lineno": node.lineno, "deps": deps}
+            )
+
+    def visit_block(self, stmts):
+        for stmt in stmts:
+            self.visit_stmt(stmt)
+
+    def visit_stmt(self, stmt):
+        if isinstance(stmt, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+            targets = getattr(stmt, "targets", None) or [stmt.target]
+            if stmt.value is not None:
+                self.scan(stmt.value)
+                for target in targets:
+                    self.bind(target, self.deps(stmt.value))
+        elif isinstance(stmt, ast.Return):
+            if stmt.value is not None:
+                self.scan(stmt.value)
+                self.returns = merge(self.returns, self.deps(stmt.value))
+        elif isinstance(stmt, (ast.For, ast.AsyncFor)):
+            self.scan(stmt.iter)
+            self.bind(stmt.target, self.deps(stmt.iter))
+            self.visit_block(stmt.body)
+            self.visit_block(stmt.orelse)
+        elif isinstance(stmt, (ast.If, ast.While)):
+            self.scan(stmt.test)
+            self.visit_block(stmt.body)
+            self.visit_block(stmt.orelse)
+        elif isinstance(stmt, (ast.With, ast.AsyncWith)):
+            for item in stmt.items:
+                self.scan(item.context_expr)
+                if item.optional_vars is not None:
+                    self.bind(
+                        item.optional_vars, self.deps(item.context_expr)
+                    )
+
+            self.visit_block(stmt.body)
+        elif isinstance(stmt, ast.Try):
+            self.visit_block(stmt.body)
+            for handler in stmt.handlers:
+                self.visit_block(handler.body)
+
+            self.visit_block(stmt.orelse)
+            self.visit_block(stmt.finalbody)
+        elif isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            # Le funzioni annidate condividono le variabili del contenitore
+            self.visit_block(stmt.body)
+        elif not isinstance(stmt, ast.ClassDef):
+            self.scan(stmt)
+
+    def analyze(self):
+        # Due passate: la seconda vede gli assegnamenti successivi all'uso,
+        # ad esempio nei cicli
+        for _ in range(2):
+            self.sinks = []
+            self.calls = []
+            self.returns = []
+            self.visit_block(self.node.body)
+
+        return {
+            "params": self.params,
+            "returns": self.returns,
+            "sinks": self.sinks,
+            "calls": self.calls,
+        }
+
+
+def summarize_module(module, path):
+    symbols = utils.get_symbols(module, path)
+    module_name = utils.get_module_name(path)
+    module_functions = {
+        stmt.name
+        for stmt in module.body
+        if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef))
+    }
+
+    summaries = {}
+    for stmt in module.body:
+        if isinstance(stmt, ast.ClassDef):
+            functions = [
+                (f"{stmt.name}.{child.name}", child)
+                for child in stmt.body
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))
+            ]
+        elif isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions = [(stmt.name, stmt)]
+        else:
+            continue
+
+        for name, node in functions:
+            summaries[f"{module_name}.{name}"] = FunctionAnalyzer(
+                node, symbols, module_name, module_functions
+            ).analyze()
+
+    return summaries
+
+
+def get_cache_path(app_configs):
+    # La cache su disco è attiva solo con SIMC_DJANGOCHECKS_CACHE_DIR
+    if utils.get_setting("CACHE_DIR") is None:
+        return None
+
+    # Una cache per progetto e insieme di app: l'analisi di una singola app
+    # (ad esempio di terze parti) non sovrascrive quella del progetto
+    base_dir = str(getattr(settings, "BASE_DIR", None) or os.getcwd())
+    app_names = sorted(app.name for app in utils.list_apps(app_configs))
+    project = hashlib.sha1(
+        "\0".join([base_dir] + app_names).encode()
+    ).hexdigest()[:12]
+    return Path(utils.get_cache_dir()) / f"taint-{project}.json"
+
+
+def load_cache(path):
+    if path is None:
+        return {}
+
+    try:
+        with open(path) as fp:
+            cache = json.load(fp)
+    except (OSError, ValueError):
+        return {}
+
+    if cache.get("version") != CACHE_VERSION:
+        return {}
+
+    return cache["files"]
+
+
+def save_cache(path, files):
+    utils.save_json(path, {"version": CACHE_VERSION, "files": files})
+
+
+class Analysis:
+    def __init__(self, summaries, paths):
+        self.summaries = summaries
+        self.paths = paths
+        self.returns = {}
+        self.tainted = {}
+        self.param_sinks = {name: {} for name in summaries}
+
+    def get_argument(self, callee, call, index):
+        params = self.summaries[callee]["params"]
+        if index < len(call["args"]):
+            return call["args"][index]
+
+        return call["kwargs"].get(params[index], [])
+
+    def resolve(self, deps):
+        resolved = set()
+        for dep in deps:
+            if isinstance(dep, str):
+                resolved.add(dep)
+                continue
+
+            callee = dep["call"]
+            if callee not in self.summaries:
+                # Funzione esterna al progetto: il risultato dipende da tutti
+                # gli argomenti
+                resolved |= self.resolve(
+                    merge(*dep["args"], *dep["kwargs"].values())
+                )
+                continue
+
+            for returned in self.resolve_returns(callee):
+                if returned == "src":
+                    resolved.add("src")
+                else:
+                    index = int(returned.split(":")[1])
+                    resolved |= self.resolve(
+                        self.get_argument(callee, dep, index)
+                    )
+
+        return resolved
+
+    def resolve_returns(self, name):
+        if name not in self.returns:
+            # Ricorsione: il valore parziale è l'insieme vuoto
+            self.returns[name] = set()
+            self.returns[name] = self.resolve(self.summaries[name]["returns"])
+
+        return self.returns[name]
+
+    def add_param_sinks(self, name, resolved, sink, trace):
+        added = False
+        for dep in resolved:
+            if dep == "src":
+                self.tainted.setdefault(sink, " -> ".join(trace))
+            else:
+                index = int(dep.split(":")[1])
+                sinks = self.param_sinks[name].setdefault(index, {})
+                if sink not in sinks:
+                    sinks[sink] = trace
+                    added = True
+
+        return added
+
+    def run(self):
+        callers = {}
+        for name, summary in self.summaries.items():
+            for call in summary["calls"]:
+                callers.setdefault(call["callee"], []).append((name, call))
+
+        pending = []
+        for name, summary in self.summaries.items():
+            for sink in summary["sinks"]:
+                location = (self.paths[name], sink["lineno"], sink["kind"])
+                if self.add_param_sinks(
+                    name, self.resolve(sink["deps"]), location, [name]
+                ):
+                    pending.append(name)
+
+        while pending:
+            callee = pending.pop()
+            for caller, call in callers.get(callee, []):
+                for index, sinks in list(self.param_sinks[callee].items()):
+                    if index >= len(self.summaries[callee]["params"]):
+                        continue
+
+                    resolved = self.resolve(
+                        self.get_argument(callee, call, index)
+                    )
+                    for sink, trace in list(sinks.items()):
+                        if self.add_param_sinks(
+                            caller, resolved, sink, [caller] + trace
+                        ):
+                            pending.append(caller)
+
+        return self.tainted
+
+
+analysis_lock = threading.Lock()
+analysis_cache = {}
+
+
+def list_project_files(app_configs):
+    # L'analisi è interprocedurale: considera sempre tutti i file, anche con
+    # lo sharding attivo
+    for app in utils.list_apps(app_configs):
+        yield from Path(app.path).rglob("*.py")
+
+
+def get_tainted_sinks(app_configs):
+    with analysis_lock:
+        files = []
+        for path in list_project_files(app_configs):
+            stat = path.stat()
+            files.append((str(path), stat.st_mtime_ns, stat.st_size))
+
+        key = tuple(files)
+        if key in analysis_cache:
+            return analysis_cache[key]
+
+        if not any(
+            utils.get_file_tokens(path) & SINK_TOKENS for path, _, _ in files
+        ):
+            analysis_cache.clear()
+            analysis_cache[key] = {}
+            return {}
+
+        cache_path = get_cache_path(app_configs)
+        cache = load_cache(cache_path)
+        used = {}
+        summaries = {}
+        paths = {}
+        for path, _, _ in files:
+            with open(path, "rb") as fp:
+                content = fp.read()
+
+            content_hash = hashlib.sha1(
+                utils.get_package(path).encode() + b"\0" + content
+            ).hexdigest()
+            if content_hash in cache:
+                module_summaries = cache[content_hash]
+            else:
+                module_summaries = summarize_module(
+                    utils.parse_file(path), path
+                )
+
+            used[content_hash] = module_summaries
+            for name, summary in module_summaries.items():
+                summaries[name] = summary
+                paths[name] = path
+
+        if cache_path is not None and used != cache:
+            save_cache(cache_path, used)
+
+        tainted = Analysis(summaries, paths).run()
+        analysis_cache.clear()
+        analysis_cache[key] = tainted
+        return tainted
@@ -0,0 +1,86 @@
+import functools
+import hashlib
+import json
+from pathlib import Path
+
+from django.core.checks.registry import registry
+
+from simc_djangochecks import runner, utils
+
+
+@functools.lru_cache(maxsize=None)
+def get_rules_hash():
+    # I risultati in cache sono validi solo per la stessa versione delle
+    # regole
+    digest = hashlib.sha1()
+    root = Path(__file__).parent
+    for path in sorted(root.rglob("*.py")):
+        digest.update(path.relative_to(root).as_posix().encode())
+        digest.update(path.read_bytes())
+
+    return digest.hexdigest()[:16]
+
+
+def get_cache_path(distribution, check):
+    name, version = distribution
+    return (
+        Path(utils.get_cache_dir())
+        / "third-party"
+        / get_rules_hash()
+        / f"{name}-{version}"
+        / f"{check.__module__}.{check.__qualname__}.json"
+    )
+
+
+def scan_app(check, app, **kwargs):
+    path = get_cache_path(utils.get_distribution(app.path), check)
+    try:
+        with open(path) as fp:
+            cached = json.load(fp)
+    except (OSError, ValueError):
+        cached = {}
+
+    if app.name in cached:
+        return [runner.deserialize_message(m) for m in cached[app.name]]
+
+    messages = list(check(app_configs=[app], **kwargs) or [])
+    # Con lo sharding i risultati sono parziali e non vanno salvati
+    if utils.get_shard() is None:
+        cached[app.name] = [runner.serialize_message(m) for m in messages]
+        utils.save_json(path, cached)
+
+    return messages
+
+
+class ThirdPartyCheck:
+    # Una classe invece di una closure: con l'executor a processi il check
+    # deve poter essere serializzato con pickle
+    def __init__(self, check):
+        functools.update_wrapper(self, check)
+
+    def __call__(self, app_configs=None, **kwargs):
+        if app_configs:
+            return self.__wrapped__(app_configs=app_configs, **kwargs)
+
+        # Le app del progetto vengono sempre analizzate, le dipendenze
+        # solo se non sono già in cache per la loro versione
+        messages = []
+        first_party = utils.list_first_party_apps()
+        if first_party:
+            messages.extend(
+                self.__wrapped__(app_configs=first_party, **kwargs) or []
+            )
+
+        if utils.get_setting("THIRD_PARTY", True):
+            for app in utils.list_third_party_apps():
+                messages.extend(scan_app(self.__wrapped__, app, **kwargs))
+
+        return messages
+
+
+def install():
+    for checks in (registry.registered_checks, registry.deployment_checks):
+        for check in list(checks):
+            if getattr(check, "app_scoped", False):
+                checks.discard(check)
+                checks.add(ThirdPartyCheck(check))
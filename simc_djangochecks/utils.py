@@ -1,14 +1,653 @@
+import ast
+import builtins
+import functools
+import hashlib
+import importlib.metadata
+import importlib.util
+import json
+import mmap
+import os
+import re
+import site
+import sys
+import sysconfig
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
 from django.apps import apps
+from django.conf import settings
+from django.urls import URLResolver, get_resolver
+
+
+PERFORMANCE_TAG = "performance"
+
+SHARD_ENVIRONMENT_VARIABLE = "SIMC_DJANGOCHECKS_SHARD"
+
+
+def get_setting(name, default=None):
+    return getattr(settings, f"SIMC_DJANGOCHECKS_{name}", default)
+
+
+def is_project_app(app):
+    return not app.name.startswith("django.") and not app.name.startswith(
+        "simc_djangochecks"
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_packages_distributions():
+    return importlib.metadata.packages_distributions()
+
+
+@functools.lru_cache(maxsize=None)
+def get_site_packages():
+    paths = {sysconfig.get_paths()[k] for k in ("purelib", "platlib")}
+    paths.update(getattr(site, "getsitepackages", list)())
+    paths.add(site.getusersitepackages())
+    return [Path(p).resolve() for p in paths if p]
+
+
+def is_site_packages(path):
+    # Le app installate in modalità editable restano fuori da
+    # site-packages e fanno parte del progetto
+    return any(
+        part in ("site-packages", "dist-packages") for part in path.parts
+    ) or any(path.is_relative_to(p) for p in get_site_packages())
+
+
+@functools.lru_cache(maxsize=None)
+def get_distribution(app_path):
+    path = Path(app_path).resolve()
+    if not is_site_packages(path):
+        return None
+
+    package = get_package(path / "__init__.py").split(".")[0]
+    distributions = get_packages_distributions().get(package)
+    if not distributions:
+        return None
+
+    name = distributions[0]
+    return name, importlib.metadata.version(name)
 
 
 def list_apps(app_configs):
     return (
         app_configs
         if app_configs
-        else [
-            a
-            for a in apps.get_app_configs()
-            if not a.name.startswith("django.")
-            and not a.name.startswith("simc_djangochecks")
-        ]
+        else [a for a in apps.get_app_configs() if is_project_app(a)]
+    )
+
+
+def list_first_party_apps():
+    return [a for a in list_apps(None) if get_distribution(a.path) is None]
+
+
+def list_third_party_apps():
+    return [
+        a for a in list_apps(None) if get_distribution(a.path) is not None
+    ]
+
+
+def source_scoped(check):
+    # Il check analizza solo i sorgenti (codice e template) e i settings:
+    # i risultati restano validi finché questi non cambiano
+    check.source_scoped = True
+    return check
+
+
+def app_scoped(check):
+    # Il check analizza solo il codice delle app: può essere eseguito
+    # separatamente per ogni app di terze parti
+    check.app_scoped = True
+    return source_scoped(check)
+
+
+def serial(check):
+    # Il check modifica lo stato globale del processo (settings,
+    # connessioni al database): simc_check lo esegue da solo, dopo gli altri
+    check.serial = True
+    return check
+
+
+def get_shard():
+    # "i/N", con 1 <= i <= N
+    shard = os.environ.get(SHARD_ENVIRONMENT_VARIABLE)
+    if not shard:
+        return None
+
+    index, total = (int(value) for value in shard.split("/"))
+    if not 1 <= index <= total:
+        raise ValueError(f"{SHARD_ENVIRONMENT_VARIABLE} non valido: {shard}")
+
+    return index, total
+
+
+def in_shard(key, shard):
+    if shard is None:
+        return True
+
+    index, total = shard
+    return zlib.crc32(key.encode()) % total == index - 1
+
+
+trigger_tokens = set()
+trigger_regex = None
+file_tokens = {}
+file_tokens_lock = threading.Lock()
+
+# Oltre questa dimensione i file vengono letti con mmap
+MMAP_MIN_SIZE = 2 ** 20
+
+
+def register_tokens(*tokens):
+    global trigger_regex
+    with file_tokens_lock:
+        if not trigger_tokens.issuperset(tokens):
+            trigger_tokens.update(tokens)
+            trigger_regex = None
+            file_tokens.clear()
+
+    return frozenset(tokens)
+
+
+def get_trigger_regex():
+    global trigger_regex
+    with file_tokens_lock:
+        if trigger_regex is None:
+            # Lookahead: i match possono sovrapporsi, quindi un token che
+            # inizia dentro uno più lungo (ad esempio "safe" in "mark_safe")
+            # viene trovato comunque
+            trigger_regex = re.compile(
+                b"(?=("
+                + b"|".join(
+                    re.escape(token)
+                    for token in sorted(trigger_tokens, key=len, reverse=True)
+                )
+                + b"))"
+            )
+
+        return trigger_regex
+
+
+def find_tokens(regex, data):
+    found = set()
+    for match in regex.finditer(data):
+        found.add(match.group(1))
+        if len(found) == len(trigger_tokens):
+            break
+
+    # Nella stessa posizione vince il token più lungo: vanno aggiunti i
+    # token che ne sono un prefisso (ad esempio "safe" in "safeseq")
+    return frozenset(
+        token
+        for token in trigger_tokens
+        if any(token in match for match in found)
+    )
+
+
+def get_file_tokens(path):
+    stat = os.stat(path)
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    tokens = file_tokens.get(key)
+    if tokens is not None:
+        return tokens
+
+    regex = get_trigger_regex()
+    if stat.st_size == 0:
+        tokens = frozenset()
+    elif stat.st_size < MMAP_MIN_SIZE:
+        with open(path, "rb") as fp:
+            tokens = find_tokens(regex, fp.read())
+    else:
+        with open(path, "rb") as fp:
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                tokens = find_tokens(regex, data)
+
+    with file_tokens_lock:
+        file_tokens[key] = tokens
+
+    return tokens
+
+
+def iter_files(root, pattern, label=None, tokens=None):
+    root = Path(root)
+    shard = get_shard()
+    for path in root.rglob(pattern):
+        key = path.relative_to(root).as_posix()
+        if label is not None:
+            key = f"{label}/{key}"
+
+        if not in_shard(key, shard):
+            continue
+
+        # I file che non contengono nessuno dei token non vengono analizzati
+        if tokens is not None and tokens.isdisjoint(get_file_tokens(path)):
+            continue
+
+        yield path
+
+
+def iter_app_files(app, pattern, tokens=None):
+    return iter_files(app.path, pattern, app.name, tokens)
+
+
+DEFINITIONS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+
+def format_size(size):
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+
+    return f"{size:.1f} GiB"
+
+
+def get_relative_path(path):
+    base_dir = Path(getattr(settings, "BASE_DIR", None) or os.getcwd())
+    path = Path(path)
+    try:
+        return path.resolve().relative_to(base_dir.resolve()).as_posix()
+    except ValueError:
+        pass
+
+    # Fuori dal progetto (ad esempio site-packages): percorso del modulo
+    package = get_package(path)
+    if package:
+        return "/".join(package.split(".") + [path.name])
+
+    return path.as_posix()
+
+
+def get_start_lineno(stmt):
+    # I decoratori precedono la riga del def o del class
+    return min(
+        [stmt.lineno]
+        + [d.lineno for d in getattr(stmt, "decorator_list", [])]
+    )
+
+
+def get_enclosing_definition(module, lineno):
+    scope = module
+    body = module.body
+    while body:
+        for stmt in body:
+            if get_start_lineno(stmt) <= lineno <= stmt.end_lineno:
+                break
+        else:
+            break
+
+        if isinstance(stmt, DEFINITIONS):
+            scope = stmt
+            body = stmt.body
+        else:
+            if scope is module:
+                scope = stmt
+            break
+
+    return scope
+
+
+def get_scope_hash(scope):
+    # Calcolato una sola volta per definizione, anche con molti messaggi
+    if not hasattr(scope, "simc_code_hash"):
+        scope.simc_code_hash = get_code_hash(ast.dump(scope))
+
+    return scope.simc_code_hash
+
+
+def get_code_hash(code):
+    return hashlib.sha1(code.encode()).hexdigest()[:16]
+
+
+def locate_node(message, path, module, node):
+    # ast.dump esclude posizioni e commenti: l'hash non cambia se il codice
+    # viene solo spostato
+    scope = get_enclosing_definition(module, node.lineno)
+    message.path = get_relative_path(path)
+    message.code_hash = get_scope_hash(scope)
+    return message
+
+
+def locate_text(message, path, text):
+    message.path = get_relative_path(path)
+    message.code_hash = get_code_hash(" ".join(text.split()))
+    return message
+
+
+# Rapporto approssimativo tra la memoria occupata da un AST e la dimensione
+# del sorgente
+AST_SIZE_FACTOR = 30
+
+
+class ModuleCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.peak_size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.modules = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        stat = os.stat(path)
+        key = (str(path), stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            if key in self.modules:
+                self.hits += 1
+                self.modules.move_to_end(key)
+                return self.modules[key][0]
+
+        with open(path, "rb") as fp:
+            module = ast.parse(fp.read())
+
+        size = stat.st_size * AST_SIZE_FACTOR
+        with self.lock:
+            self.misses += 1
+            if key not in self.modules and size <= self.max_size:
+                self.modules[key] = (module, size)
+                self.size += size
+                self.peak_size = max(self.peak_size, self.size)
+                while self.size > self.max_size:
+                    _, (_, evicted_size) = self.modules.popitem(last=False)
+                    self.size -= evicted_size
+                    self.evictions += 1
+
+        return module
+
+    def clear(self):
+        with self.lock:
+            self.modules.clear()
+            self.size = 0
+
+    def stats(self):
+        return (
+            f"cache AST: {self.hits} hit, {self.misses} miss, "
+            f"{self.evictions} evict, picco ~{self.peak_size // 2 ** 20} MiB"
+        )
+
+
+module_cache = None
+module_cache_lock = threading.Lock()
+
+
+def get_module_cache():
+    global module_cache
+    with module_cache_lock:
+        if module_cache is None:
+            module_cache = ModuleCache(
+                get_setting("AST_CACHE_SIZE", 256 * 2 ** 20)
+            )
+
+    return module_cache
+
+
+def parse_file(path):
+    return get_module_cache().get(path)
+
+
+def clear_module_cache():
+    # Gli AST servono solo durante un'esecuzione dei check: nei processi di
+    # lunga durata (runserver) non devono restare in memoria
+    with module_cache_lock:
+        cache = module_cache
+
+    if cache is not None:
+        cache.clear()
+
+
+class Finding:
+    __slots__ = (
+        "cls",
+        "msg",
+        "args",
+        "hint",
+        "obj",
+        "id",
+        "path",
+        "code_hash",
     )
+
+    def __init__(self, cls, msg, *args, hint=None, obj=None, id=None):
+        self.cls = cls
+        self.msg = msg
+        self.args = args
+        self.hint = hint
+        self.obj = obj
+        self.id = id
+        self.path = None
+        self.code_hash = None
+
+    def to_message(self):
+        message = self.cls(
+            self.msg.format(*self.args) if self.args else self.msg,
+            hint=self.hint,
+            obj=self.obj,
+            id=self.id,
+        )
+        if self.path is not None:
+            message.path = self.path
+            message.code_hash = self.code_hash
+
+        return message
+
+
+def to_messages(findings):
+    return [finding.to_message() for finding in findings]
+
+
+@functools.lru_cache(maxsize=None)
+def get_package(path):
+    path = Path(path).resolve()
+    relative = None
+    for entry in sys.path:
+        try:
+            candidate = path.relative_to(Path(entry or os.getcwd()).resolve())
+        except (ValueError, OSError):
+            continue
+
+        if relative is None or len(candidate.parts) < len(relative.parts):
+            relative = candidate
+
+    if relative is None:
+        return ""
+
+    return ".".join(relative.parent.parts)
+
+
+def get_module_name(path):
+    package = get_package(path)
+    name = Path(path).stem
+    if name == "__init__":
+        return package
+
+    return f"{package}.{name}" if package else name
+
+
+def get_cache_dir():
+    cache_dir = get_setting("CACHE_DIR")
+    if cache_dir is None:
+        cache_dir = os.path.join(
+            os.environ.get("XDG_CACHE_HOME")
+            or os.path.join(os.path.expanduser("~"), ".cache"),
+            "simc_djangochecks",
+        )
+
+    return cache_dir
+
+
+def save_json(path, data, **kwargs):
+    # La cache è un'ottimizzazione: se la directory non è scrivibile i check
+    # proseguono senza
+    path = Path(path)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "w") as fp:
+            json.dump(data, fp, **kwargs)
+
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+        return False
+
+    return True
+
+
+def resolve_relative_import(module, level, package):
+    if not level:
+        return module
+
+    parts = package.split(".") if package else []
+    if level > 1:
+        parts = parts[:-(level - 1)]
+
+    if module:
+        parts.append(module)
+
+    return ".".join(parts)
+
+
+class SymbolTable:
+    def __init__(self, module, package=""):
+        # nome locale -> nome qualificato
+        self.names = {}
+        # (nodo, nome qualificato) per ogni modulo o oggetto importato
+        self.imports = []
+        for node in ast.walk(module):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    self.imports.append((node, alias.name))
+                    if alias.asname:
+                        self.names[alias.asname] = alias.name
+                    else:
+                        top = alias.name.split(".")[0]
+                        self.names[top] = top
+            elif isinstance(node, ast.ImportFrom):
+                base = resolve_relative_import(
+                    node.module, node.level, package
+                )
+                for alias in node.names:
+                    if alias.name == "*":
+                        self.imports.append((node, base))
+                        continue
+
+                    qualname = f"{base}.{alias.name}"
+                    self.imports.append((node, qualname))
+                    self.names[alias.asname or alias.name] = qualname
+
+    def resolve(self, node):
+        if isinstance(node, ast.Name):
+            if node.id in self.names:
+                return self.names[node.id]
+
+            if hasattr(builtins, node.id):
+                return f"builtins.{node.id}"
+
+            return node.id
+
+        if isinstance(node, ast.Attribute):
+            base = self.resolve(node.value)
+            if base is not None:
+                return f"{base}.{node.attr}"
+
+        return None
+
+
+def get_symbols(module, path):
+    # Calcolata una sola volta per modulo, come l'AST
+    if not hasattr(module, "simc_symbols"):
+        module.simc_symbols = SymbolTable(module, get_package(path))
+
+    return module.simc_symbols
+
+
+class QualifiedNames:
+    def __init__(self, *patterns):
+        self.names = frozenset(p for p in patterns if not p.endswith(".*"))
+        self.prefixes = frozenset(
+            p[:-2] for p in patterns if p.endswith(".*")
+        )
+
+    def __contains__(self, qualname):
+        if qualname is None:
+            return False
+
+        if qualname in self.names:
+            return True
+
+        parts = qualname.split(".")
+        return any(
+            ".".join(parts[:i]) in self.prefixes
+            for i in range(1, len(parts))
+        )
+
+
+def is_view_module(path):
+    path = Path(path)
+    return path.name == "views.py" or "views" in path.parent.parts
+
+
+def get_request_path_files(app_configs):
+    # Moduli delle app raggiungibili tramite import dalle viste e dall'URLconf
+    modules = {}
+    roots = []
+    for app in list_apps(app_configs):
+        for path in Path(app.path).rglob("*.py"):
+            modules[get_module_name(path)] = path
+            if is_view_module(path):
+                roots.append(path)
+
+    urlconf = getattr(settings, "ROOT_URLCONF", None)
+    if urlconf:
+        try:
+            spec = importlib.util.find_spec(urlconf)
+        except (ImportError, ValueError):
+            spec = None
+
+        if spec is not None and spec.origin and spec.origin.endswith(".py"):
+            roots.append(Path(spec.origin))
+
+    reachable = set()
+    pending = list(roots)
+    while pending:
+        path = pending.pop()
+        if path in reachable:
+            continue
+
+        reachable.add(path)
+        module = parse_file(path)
+        for _, qualname in get_symbols(module, path).imports:
+            # import a.b.c può riferirsi al modulo a.b.c o all'oggetto c
+            # del modulo a.b
+            parts = qualname.split(".")
+            for i in range(len(parts), 0, -1):
+                target = modules.get(".".join(parts[:i]))
+                if target is not None:
+                    pending.append(target)
+                    break
+
+    return reachable
+
+
+def iter_url_patterns(resolver=None, parents=()):
+    # Catene (resolver, ..., pattern) dell'URLconf appiattito
+    if resolver is None:
+        if not getattr(settings, "ROOT_URLCONF", None):
+            return
+
+        resolver = get_resolver()
+
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_url_patterns(pattern, parents + (pattern,))
+        else:
+            yield parents + (pattern,)